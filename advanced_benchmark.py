@@ -4,26 +4,21 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from core.retriever import search_vector, search_graph, get_user_context
 from brain import ask_brain
-import qdrant_client
+from core.chunk_store import build_chunk_store, open_chunk_store
+from core.usage import UsageCallback, export_usage
 
 # --- CONFIGURATION ---
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-evaluator_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, callbacks=[UsageCallback("baseline")])
+evaluator_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, callbacks=[UsageCallback("benchmark_eval")])
 embedding_model = OpenAIEmbeddings()
 
 # --- 1. SETUP BM25 (Keyword Baseline) ---
-# We need to fetch all chunks from Qdrant to build the BM25 index locally
+# Built from the shared chunk store (the same chunks the vector and graph
+# indexers read), so nothing has to be pulled back out of Qdrant.
 # In a real production system, you'd use a search engine like Elasticsearch/Solr for this.
-print("⏳ Building BM25 Index (Fetching chunks)...")
-client = qdrant_client.QdrantClient(url="http://localhost:6333")
-# Fetch 1000 points (assuming small dataset for demo)
-records = client.scroll(
-    collection_name="tech_ecosystem", 
-    limit=1000, 
-    with_payload=True
-)[0]
-
-documents = [r.payload['page_content'] for r in records if 'page_content' in r.payload]
+print("⏳ Building BM25 Index (Reading chunk store)...")
+build_chunk_store()
+documents = open_chunk_store().column("text").to_pylist()
 tokenized_corpus = [doc.split(" ") for doc in documents]
 bm25 = BM25Okapi(tokenized_corpus)
 print(f"✅ BM25 Index ready with {len(documents)} documents.")
@@ -160,4 +155,7 @@ print(avg_scores)
 # Save
 df.to_csv("advanced_benchmark_details.csv", index=False)
 pivot_df.to_markdown("advanced_benchmark_summary.md")
-print("\n📄 Report saved to 'advanced_benchmark_summary.md'")
\ No newline at end of file
+print("\n📄 Report saved to 'advanced_benchmark_summary.md'")
+
+# Token usage and cost of the whole run (per request, stage and persona)
+export_usage("advanced_benchmark")
\ No newline at end of file
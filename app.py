@@ -1,6 +1,9 @@
 import streamlit as st
 import time
 from brain import ask_brain
+from core.session import ConversationSession
+from core.retriever import list_users
+from core.jobs import JobQueue, QueueFullError, JobCancelled, StageTimeout
 
 # --- Page Config ---
 st.set_page_config(page_title="Agentic RAG", page_icon="🧠", layout="wide")
@@ -8,16 +11,84 @@ st.set_page_config(page_title="Agentic RAG", page_icon="🧠", layout="wide")
 st.title("🧠 Agentic Hybrid RAG Engine")
 st.markdown("_Graph (Neo4j) + Vector (Qdrant) + Semantic Router + Memory_")
 
+# --- Job Queue (one per server process, shared by every browser session) ---
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+job_queue = get_job_queue()
+
+# --- Persona Directory (paged from Neo4j, see setup_users.py) ---
+GUEST_USER = "Guest"  # Not in the graph: answers use the neutral default profile
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_user_page(after: str, prefix: str):
+    users = list_users(after=after, prefix=prefix)
+    if users is None:
+        # Raised, not returned, so the outage isn't cached for the TTL
+        raise ConnectionError("user directory unreachable")
+    return users
+
 # --- Sidebar: Persona Selection ---
 with st.sidebar:
     st.header("👤 Active Persona")
-    # You can add more users here if you created them in Neo4j
-    selected_user = st.radio("Who are you?", ["Rahul", "Ram"])
+    prefix = st.text_input("Find user", placeholder="Start of a user id")
+    
+    # Pages are appended, never replaced, so the chosen persona stays in the list
+    if st.session_state.get("user_prefix") != prefix or st.session_state.get("user_options") is None:
+        st.session_state.user_prefix = prefix
+        try:
+            st.session_state.user_options = load_user_page("", prefix)
+        except ConnectionError:
+            st.session_state.user_options = None
+    user_options = st.session_state.user_options
+    
+    # Without personas the engine still answers, just in a neutral tone
+    if user_options is None:
+        st.warning("Neo4j is unreachable, so personas can't be loaded. Answering as a guest.")
+        selected_user = GUEST_USER
+    elif not user_options:
+        if prefix:
+            st.warning(f"No users start with '{prefix}'. Answering as a guest.")
+        else:
+            st.warning("No users found. Run `python setup_users.py` to create them. Answering as a guest.")
+        selected_user = GUEST_USER
+    else:
+        current = st.session_state.get("persona")
+        index = user_options.index(current) if current in user_options else 0
+        selected_user = st.session_state.persona = st.selectbox("Who are you?", user_options, index=index)
+        if st.button("Load more users"):
+            try:
+                user_options.extend(load_user_page(user_options[-1], prefix))
+                st.rerun()
+            except ConnectionError:
+                st.warning("Neo4j is unreachable; can't load more users right now.")
     
     st.info(f"**Current Mode:** {selected_user}\nThe engine will adapt answers to this profile.")
     
     if st.button("Clear Chat History"):
         st.session_state.messages = []
+        st.session_state.pop("conversation", None)
+    
+    st.header("📊 Engine Load")
+    metrics_box = st.empty()
+
+def render_metrics():
+    stats = job_queue.snapshot()
+    with metrics_box.container():
+        col1, col2 = st.columns(2)
+        col1.metric("Queued", stats["queued"])
+        col2.metric("Running", stats["running"])
+        col1.metric("Rejected", stats["rejected"])
+        col2.metric("Timed out", stats["timed_out"])
+        st.caption(f"Degraded stages: {stats['degraded_stages']} · Cancelled: {stats['cancelled']}")
+
+render_metrics()
+
+# --- Conversation Session (persona, entities, retrieved context) ---
+# A new persona starts a new session so cached profile/context never leak across users
+if st.session_state.get("conversation") is None or st.session_state.conversation.user_id != selected_user:
+    st.session_state.conversation = ConversationSession(selected_user)
 
 # --- Chat History ---
 if "messages" not in st.session_state:
@@ -40,12 +111,35 @@ if prompt := st.chat_input("Ask about Tesla, Microsoft, or AI risks..."):
         
         with st.spinner(f"Thinking as {selected_user}..."):
             try:
-                # Call the Brain with the selected persona
-                response = ask_brain(prompt, user_id=selected_user)
+                # Call the Brain with the selected persona, off the script thread
+                job = job_queue.submit(ask_brain, prompt, user_id=selected_user, session=st.session_state.conversation)
+                
+                # Poll instead of blocking, so Streamlit can interrupt this run
+                try:
+                    while not job.done():
+                        message_placeholder.caption(f"⏳ {job.stage}...")
+                        render_metrics()
+                        time.sleep(0.25)
+                finally:
+                    # Interrupted by a rerun (new question, persona change) or a closed
+                    # tab: the answer is abandoned, stop spending tokens on it
+                    if not job.done():
+                        job.cancel()
+                render_metrics()
                 
-                # Simple typewriter effect for the UI
+                response = job.future.result()
                 message_placeholder.markdown(response)
                 full_response = response
+            except QueueFullError:
+                full_response = "⚠️ The engine is busy right now. Please try again in a moment."
+                message_placeholder.warning(full_response)
+                render_metrics()
+            except StageTimeout as e:
+                full_response = f"⏱️ This question took too long to answer ({e})."
+                message_placeholder.warning(full_response)
+            except JobCancelled:
+                full_response = "Cancelled."
+                message_placeholder.caption(full_response)
             except Exception as e:
                 st.error(f"Error: {e}")
                 full_response = f"Error: {e}"
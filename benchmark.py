@@ -2,9 +2,10 @@ import pandas as pd
 from core.retriever import search_vector
 from brain import ask_brain
 from langchain_openai import ChatOpenAI
+from core.usage import UsageCallback, export_usage
 
 # --- Configuration ---
-evaluator_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+evaluator_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, callbacks=[UsageCallback("benchmark_eval")])
 
 # 1. Define the "Golden Dataset"
 # Questions that test different parts of your system
@@ -129,4 +130,7 @@ print("\n✅ Detailed results saved to 'benchmark_results.csv'")
 
 # Save summary to Markdown (for README)
 df[["Question", "Type", "Baseline Score", "Agentic Score", "Winner"]].to_markdown("benchmark_summary.md", index=False)
-print("✅ Summary table saved to 'benchmark_summary.md'")
\ No newline at end of file
+print("✅ Summary table saved to 'benchmark_summary.md'")
+
+# Token usage and cost of the whole run (per request, stage and persona)
+export_usage("benchmark")
\ No newline at end of file
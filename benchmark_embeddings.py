@@ -0,0 +1,56 @@
+import os
+import time
+import pandas as pd
+from core.chunk_store import build_chunk_store, open_chunk_store
+from core.embeddings import LocalEmbeddingProvider, OpenAIEmbeddingProvider
+
+# --- Configuration ---
+DATA_PATH = "./data"
+THREAD_COUNTS = [1, 2, 4, os.cpu_count() or 1]
+BATCH_SIZES = [16, 64, 256]
+OPENAI_SAMPLE = 200  # Texts sent to the API baseline (it costs money); 0 to skip
+
+# --- Load the corpus chunks (the same shared store the indexers embed) ---
+build_chunk_store(DATA_PATH)
+texts = open_chunk_store()["text"].to_pylist()
+print(f"✅ Loaded {len(texts)} chunks for embedding.")
+
+def throughput(provider, sample):
+    start = time.perf_counter()
+    provider.embed_documents(sample)
+    elapsed = time.perf_counter() - start
+    return len(sample) / elapsed, elapsed
+
+# --- Main Execution ---
+results = []
+print("\n📊 BENCHMARKING EMBEDDING THROUGHPUT...\n")
+
+for threads in sorted(set(THREAD_COUNTS)):
+    for batch_size in BATCH_SIZES:
+        provider = LocalEmbeddingProvider(batch_size=batch_size, num_threads=threads)
+        provider.embed_documents(texts[:batch_size])  # Warm-up
+        rate, elapsed = throughput(provider, texts)
+        print(f"   🧪 local threads={threads} batch={batch_size}: {rate:,.0f} texts/s")
+        results.append({
+            "Provider": provider.name, "Threads": threads, "Batch Size": batch_size,
+            "Texts": len(texts), "Seconds": round(elapsed, 3), "Texts/sec": round(rate, 1),
+        })
+
+if OPENAI_SAMPLE and os.getenv("OPENAI_API_KEY"):
+    provider = OpenAIEmbeddingProvider()
+    sample = texts[:OPENAI_SAMPLE]
+    rate, elapsed = throughput(provider, sample)
+    print(f"   🧪 openai: {rate:,.0f} texts/s")
+    results.append({
+        "Provider": provider.name, "Threads": None, "Batch Size": None,
+        "Texts": len(sample), "Seconds": round(elapsed, 3), "Texts/sec": round(rate, 1),
+    })
+
+# --- Reporting ---
+df = pd.DataFrame(results)
+print("\n🏆 EMBEDDING THROUGHPUT")
+print(df)
+
+df.to_csv("embedding_benchmark.csv", index=False)
+df.to_markdown("embedding_benchmark.md", index=False)
+print("\n📄 Report saved to 'embedding_benchmark.md'")
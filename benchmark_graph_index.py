@@ -0,0 +1,93 @@
+import time
+import pandas as pd
+from neo4j import GraphDatabase
+from core.retriever import (
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, ENTITY_FULLTEXT_INDEX, get_entity_linker
+)
+
+# --- Configuration ---
+# Entity-centric questions; the anchor is what the graph query starts from
+QUESTIONS = [
+    "Who is the CEO of Tesla?",
+    "Does Meta own Instagram?",
+    "Which companies did Microsoft acquire?",
+    "Who founded Nvidia?",
+    "What is the relationship between Elon Musk and SolarCity?",
+    "Who owns YouTube?",
+]
+
+# BEFORE: what the old prompt produced -- CONTAINS on every node
+SCAN_QUERY = """
+MATCH (a)-[r]-(b) WHERE toLower(a.id) CONTAINS toLower($term)
+RETURN a.id, type(r), b.id LIMIT 100
+"""
+# AFTER (no anchor linked): fulltext index lookup
+FULLTEXT_QUERY = f"""
+CALL db.index.fulltext.queryNodes('{ENTITY_FULLTEXT_INDEX}', $term) YIELD node AS a
+MATCH (a)-[r]-(b)
+RETURN a.id, type(r), b.id LIMIT 100
+"""
+# AFTER (anchor linked): exact seek on the unique id index
+SEEK_QUERY = """
+MATCH (a:__Entity__ {id: $term})-[r]-(b)
+RETURN a.id, type(r), b.id LIMIT 100
+"""
+
+def total_db_hits(plan):
+    """Sums dbHits over a PROFILE plan tree."""
+    return plan.get("dbHits", 0) + sum(total_db_hits(c) for c in plan.get("children", []))
+
+def profile(session, query, term):
+    start = time.perf_counter()
+    summary = session.run("PROFILE " + query, term=term).consume()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return total_db_hits(summary.profile), elapsed_ms
+
+def lucene_escape(term):
+    """Escapes Lucene query syntax in an entity id."""
+    return "".join("\\" + ch if ch in '+-&|!(){}[]^"~*?:\\/' else ch for ch in term)
+
+# --- Main Execution ---
+linker = get_entity_linker()
+driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+results = []
+
+print("📊 PROFILING GRAPH ENTITY LOOKUPS...\n")
+
+with driver.session() as session:
+    for q in QUESTIONS:
+        start = time.perf_counter()
+        anchors = linker.find(q)
+        link_ms = (time.perf_counter() - start) * 1000
+        if not anchors:
+            print(f"   ⚠️ No anchor linked for: {q}")
+            continue
+        anchor = anchors[0]
+
+        scan_hits, scan_ms = profile(session, SCAN_QUERY, anchor)
+        fulltext_hits, fulltext_ms = profile(session, FULLTEXT_QUERY, lucene_escape(anchor))
+        seek_hits, seek_ms = profile(session, SEEK_QUERY, anchor)
+
+        print(f"   🧪 {q} -> {anchor}: {scan_hits} → {seek_hits} db hits")
+        results.append({
+            "Question": q,
+            "Anchor": anchor,
+            "Link ms": round(link_ms, 3),
+            "Scan DB Hits": scan_hits,
+            "Fulltext DB Hits": fulltext_hits,
+            "Seek DB Hits": seek_hits,
+            "Scan ms": round(scan_ms, 1),
+            "Fulltext ms": round(fulltext_ms, 1),
+            "Seek ms": round(seek_ms, 1),
+        })
+
+driver.close()
+
+# --- Reporting ---
+df = pd.DataFrame(results)
+print("\n🏆 DB HITS PER QUERY (before → after)")
+print(df[["Anchor", "Scan DB Hits", "Fulltext DB Hits", "Seek DB Hits"]])
+
+df.to_csv("graph_index_benchmark.csv", index=False)
+df.to_markdown("graph_index_benchmark.md", index=False)
+print("\n📄 Report saved to 'graph_index_benchmark.md'")
@@ -0,0 +1,55 @@
+import time
+import pandas as pd
+from core.retriever import search_graph_rows, get_relation_cache, get_entity_linker
+from core.usage import export_usage
+
+# --- Configuration ---
+REPEATS = 3  # LLM latency is noisy; average a few runs per path
+QUESTIONS = [
+    "Who is the CEO of the parent company of Instagram?",
+    "Who is the CEO of the parent company of WhatsApp?",
+    "Who is the CEO of the parent company of YouTube?",
+    "Who is the CEO of the parent company of LinkedIn?",
+    "Who is the CEO of the parent company of GitHub?",
+]
+
+def timed(fn, *args, **kwargs):
+    """Returns (mean latency in ms, last result) over REPEATS runs."""
+    total = 0.0
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        total += time.perf_counter() - start
+    return total / REPEATS * 1000, result
+
+# --- Main Execution ---
+# Warm the linker and cache so neither path pays the one-off load
+get_entity_linker()
+print(f"✅ Relation cache ready with {len(get_relation_cache())} chains.")
+
+results = []
+print("\n📊 BENCHMARKING MULTI-HOP GRAPH RETRIEVAL...\n")
+
+for q in QUESTIONS:
+    print(f"   🧪 {q}")
+    cypher_ms, (cypher_rows, _) = timed(search_graph_rows, q, use_cache=False)
+    cache_ms, (cache_rows, _) = timed(search_graph_rows, q)
+    results.append({
+        "Question": q,
+        "Generated Cypher ms": round(cypher_ms, 1),
+        "Relation Cache ms": round(cache_ms, 3),
+        "Speedup": round(cypher_ms / cache_ms, 1) if cache_ms else None,
+        "Cypher Rows": len(cypher_rows),
+        "Cache Rows": len(cache_rows),
+    })
+
+# --- Reporting ---
+df = pd.DataFrame(results)
+print("\n🏆 MULTI-HOP LATENCY (ms)")
+print(df[["Generated Cypher ms", "Relation Cache ms", "Speedup", "Cache Rows"]])
+
+df.to_csv("multihop_benchmark.csv", index=False)
+df.to_markdown("multihop_benchmark.md", index=False)
+print("\n📄 Report saved to 'multihop_benchmark.md'")
+export_usage("multihop_benchmark")  # Tokens spent generating Cypher
@@ -0,0 +1,117 @@
+import os
+import timeit
+import pandas as pd
+import tiktoken
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+from core.prompts import (
+    ROUTER_SYSTEM, ROUTE_PROMPT, CYPHER_PROMPT, PLAN_PROMPT, SYNTHESIS_PROMPT,
+)
+from core.router import RouteQuery
+
+# --- Configuration ---
+REPEATS = 2000
+CACHE_CALLS = 5           # Repeated synthesis calls to observe provider-side caching; 0 to skip
+CACHE_MIN_TOKENS = 1024   # OpenAI only caches prompts at least this long
+MARKER = "\x00VARIABLE\x00"
+
+QUESTION = "Who is the CEO of the parent company of Instagram?"
+USER_CONTEXT = "User Profile: Ram is a CEO. Preferences: executive summaries, strategy."
+RAW_DATA = "Instagram -[SUBSIDIARY_OF]- Meta\nMark Zuckerberg -[CEO_OF]- Meta"
+
+encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+
+
+def tokens(text):
+    return len(encoding.encode(text))
+
+
+def rendered(prompt, **values):
+    """Renders a prompt to the text the provider sees (messages joined in order)."""
+    value = prompt.invoke(values)
+    if hasattr(value, "to_messages"):
+        return "\n".join(m.content for m in value.to_messages())
+    return value.to_string()
+
+
+def static_prefix(prompt, **values):
+    """Text before the first per-request variable: the part that can be cached."""
+    return rendered(prompt, **{k: MARKER for k in values}).split(MARKER)[0]
+
+
+def build_router_per_call():
+    """The old route_question: prompt, client and structured chain rebuilt per call."""
+    prompt = ChatPromptTemplate.from_messages([("system", ROUTER_SYSTEM), ("human", "{question}")])
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    chain = prompt | llm.with_structured_output(RouteQuery)
+    return chain, prompt.invoke({"question": QUESTION})
+
+
+def format_precompiled():
+    """The new route_question: only the per-request formatting is left."""
+    return ROUTE_PROMPT.invoke({"question": QUESTION})
+
+
+# --- 1. Construction overhead ---
+print("\n📊 BENCHMARKING PROMPT CONSTRUCTION...\n")
+overhead = []
+for name, fn, repeats in [
+    ("Router (built per call)", build_router_per_call, REPEATS // 10),
+    ("Router (precompiled)", format_precompiled, REPEATS),
+]:
+    seconds = timeit.timeit(fn, number=repeats)
+    per_call_us = seconds / repeats * 1e6
+    print(f"   🧪 {name}: {per_call_us:,.1f} µs/call")
+    overhead.append({"Variant": name, "Calls": repeats, "µs/call": round(per_call_us, 1)})
+
+# --- 2. Static prefix per prompt ---
+print("\n📊 MEASURING STATIC PREFIXES...\n")
+prefixes = []
+for name, prompt, values in [
+    ("Router", ROUTE_PROMPT, {"question": QUESTION}),
+    ("Cypher", CYPHER_PROMPT, {"anchors": "Instagram", "question": QUESTION}),
+    ("Planner", PLAN_PROMPT.partial(max_sub_queries="6"), {"question": QUESTION}),
+    ("Synthesis", SYNTHESIS_PROMPT, {"user_context": USER_CONTEXT, "raw_data": RAW_DATA, "question": QUESTION}),
+]:
+    prefix_tokens = tokens(static_prefix(prompt, **values))
+    total_tokens = tokens(rendered(prompt, **values))
+    print(f"   🧪 {name}: {prefix_tokens}/{total_tokens} tokens static")
+    prefixes.append({
+        "Prompt": name,
+        "Static Prefix Tokens": prefix_tokens,
+        "Total Tokens": total_tokens,
+        "Static Share": round(prefix_tokens / total_tokens, 2),
+        "Cacheable": prefix_tokens >= CACHE_MIN_TOKENS,
+    })
+
+# --- 3. Provider-side cache hits (needs an API key) ---
+cache_hits = []
+if CACHE_CALLS and os.getenv("OPENAI_API_KEY"):
+    print("\n📊 MEASURING CACHED TOKENS (live API)...\n")
+    synthesizer = SYNTHESIS_PROMPT | ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    for i in range(CACHE_CALLS):
+        try:
+            response = synthesizer.invoke({"user_context": USER_CONTEXT, "raw_data": RAW_DATA, "question": QUESTION})
+            usage = response.response_metadata.get("token_usage", {})
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+            print(f"   🧪 call {i + 1}: {cached}/{usage.get('prompt_tokens')} prompt tokens cached")
+            cache_hits.append({"Call": i + 1, "Prompt Tokens": usage.get("prompt_tokens"), "Cached Tokens": cached})
+        except Exception as e:
+            print(f"   ⚠️ Synthesis call failed: {e}")
+            break
+
+# --- Reporting ---
+overhead_df = pd.DataFrame(overhead)
+prefix_df = pd.DataFrame(prefixes)
+print("\n🏆 PROMPT CONSTRUCTION")
+print(overhead_df)
+print("\n🏆 STATIC PREFIXES")
+print(prefix_df)
+
+pd.concat([overhead_df.assign(Table="construction"), prefix_df.assign(Table="prefix")]).to_csv("prompt_benchmark.csv", index=False)
+with open("prompt_benchmark.md", "w", encoding="utf-8") as f:
+    f.write("## Prompt construction\n\n" + overhead_df.to_markdown(index=False) + "\n\n")
+    f.write("## Static prefixes\n\n" + prefix_df.to_markdown(index=False) + "\n")
+    if cache_hits:
+        f.write("\n## Cached tokens (repeated synthesis)\n\n" + pd.DataFrame(cache_hits).to_markdown(index=False) + "\n")
+print("\n📄 Report saved to 'prompt_benchmark.md'")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import random
+import tempfile
+import numpy as np
+import pandas as pd
+from setup_users import ensure_user_constraints, import_users, read_users, BATCH_SIZE
+from core.retriever import get_graph, get_user_context, list_users
+
+# --- Configuration ---
+NUM_USERS = 100_000
+NUM_PREFERENCES = 500      # Distinct preference names shared by the synthetic users
+PREFS_PER_USER = 3
+LOOKUP_SAMPLE = 1000       # Random profile lookups timed after the import
+PAGE_SAMPLE = 100          # Persona-picker pages timed after the import
+USER_PREFIX = "bench_user_"
+SEED = 42
+
+ROLES = ["CTO", "CEO", "Engineer", "Analyst", "Product Manager", "Investor"]
+STYLES = [
+    "Technical, detailed, includes code snippets",
+    "Executive summary, concise, focuses on business value",
+    "Balanced, explains terms, uses examples",
+]
+
+rng = random.Random(SEED)
+graph = get_graph()
+
+
+def write_synthetic_users(path):
+    """Writes NUM_USERS synthetic profiles as JSONL (the format setup_users.py --file reads)."""
+    preferences = [f"Topic {i}" for i in range(NUM_PREFERENCES)]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(NUM_USERS):
+            f.write(json.dumps({
+                "id": f"{USER_PREFIX}{i:06d}",
+                "role": rng.choice(ROLES),
+                "style": rng.choice(STYLES),
+                "preferences": rng.sample(preferences, PREFS_PER_USER),
+            }) + "\n")
+
+
+def timed_import(path):
+    start = time.perf_counter()
+    count = import_users(graph, read_users(path), BATCH_SIZE)
+    elapsed = time.perf_counter() - start
+    return count, elapsed
+
+
+def latencies_ms(fn, args):
+    timings = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def cleanup():
+    """Removes the synthetic users in bounded transactions."""
+    while True:
+        deleted = graph.query("""
+        MATCH (u:User) WHERE u.id STARTS WITH $prefix
+        WITH u LIMIT 10000
+        DETACH DELETE u
+        RETURN count(*) AS deleted
+        """, {"prefix": USER_PREFIX})[0]["deleted"]
+        if not deleted:
+            break
+    graph.query("MATCH (p:Preference) WHERE p.name STARTS WITH 'Topic ' AND NOT (p)<-[:PREFERS]-() DELETE p")
+
+
+# --- Main Execution ---
+results = []
+print(f"\n📊 BENCHMARKING USER PROVISIONING ({NUM_USERS:,} users)...\n")
+ensure_user_constraints(graph)
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "users.jsonl")
+    write_synthetic_users(path)
+
+    # First run creates everything; the second must be an idempotent no-op
+    for run in ["Initial import", "Idempotent re-run"]:
+        count, elapsed = timed_import(path)
+        print(f"   🧪 {run}: {count:,} users in {elapsed:.1f}s ({count / elapsed:,.0f} users/s)")
+        results.append({"Operation": run, "Count": count, "Seconds": round(elapsed, 2),
+                        "Users/sec": round(count / elapsed, 1), "p50 ms": None, "p95 ms": None})
+
+total = graph.query("MATCH (u:User) WHERE u.id STARTS WITH $prefix RETURN count(u) AS n", {"prefix": USER_PREFIX})[0]["n"]
+print(f"   ✅ {total:,} synthetic users in the graph (expected {NUM_USERS:,})")
+
+# --- Per-user profile lookups ---
+sample = [f"{USER_PREFIX}{rng.randrange(NUM_USERS):06d}" for _ in range(LOOKUP_SAMPLE)]
+get_user_context(sample[0])  # Warm-up
+timings = latencies_ms(get_user_context, sample)
+print(f"   🧪 Profile lookup: p50={np.percentile(timings, 50):.2f}ms p95={np.percentile(timings, 95):.2f}ms")
+results.append({"Operation": "Profile lookup", "Count": LOOKUP_SAMPLE, "Seconds": round(timings.sum() / 1000, 2),
+                "Users/sec": None, "p50 ms": round(np.percentile(timings, 50), 2),
+                "p95 ms": round(np.percentile(timings, 95), 2)})
+
+# --- Persona picker pages (keyset pagination from random cursors) ---
+cursors = [f"{USER_PREFIX}{rng.randrange(NUM_USERS):06d}" for _ in range(PAGE_SAMPLE)]
+timings = latencies_ms(lambda after: list_users(after=after), cursors)
+print(f"   🧪 User page: p50={np.percentile(timings, 50):.2f}ms p95={np.percentile(timings, 95):.2f}ms")
+results.append({"Operation": "User page (keyset)", "Count": PAGE_SAMPLE, "Seconds": round(timings.sum() / 1000, 2),
+                "Users/sec": None, "p50 ms": round(np.percentile(timings, 50), 2),
+                "p95 ms": round(np.percentile(timings, 95), 2)})
+
+print("\n🧹 Removing synthetic users...")
+cleanup()
+
+# --- Reporting ---
+df = pd.DataFrame(results)
+print("\n🏆 USER PROVISIONING")
+print(df)
+
+df.to_csv("user_benchmark.csv", index=False)
+df.to_markdown("user_benchmark.md", index=False)
+print("\n📄 Report saved to 'user_benchmark.md'")
@@ -1,54 +1,192 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from core.router import route_question  # <--- CHANGED: Import the correct name
-from core.retriever import search_vector, search_graph, get_user_context 
+from core.planner import needs_decomposition, plan_question
+from core.retriever import (
+    search_vector, search_graph_rows, format_graph_rows, get_user_context,
+    link_entities, link_mentions, get_entity_neighbourhood,
+    fetch_chunks, format_chunks, MAX_SUPPORT_CHUNKS, PROFILE_HEADER
+)
+from core.prompts import SYNTHESIS_PROMPT
+from core.jobs import run_stage, try_stage, LLM_TIMEOUT
+from core.usage import UsageCallback, track_request, allow_optional, trim_to_budget
 from langchain_openai import ChatOpenAI
 
 # Initialize the Final Answer LLM
-llm = ChatOpenAI(temperature=0.7, model="gpt-4o-mini")
+llm = ChatOpenAI(
+    temperature=0.7, model="gpt-4o-mini", timeout=LLM_TIMEOUT, max_retries=1,
+    callbacks=[UsageCallback("synthesis")]
+)
+synthesizer = SYNTHESIS_PROMPT | llm
 
-def ask_brain(question: str, user_id: str = "Alice"):
+# Retrieval outcomes that must not be cached as conversation context
+RETRIEVAL_FAILURES = ("Vector Search Error", "No relevant vector results")
+VECTOR_TIMEOUT = "Vector Search Error: timed out"
+GRAPH_TIMED_OUT = object()  # try_stage fallback, told apart from an empty graph result
+DEFAULT_PERSONA = "User profile unavailable. Defaulting to neutral tone."
+
+def retrieve(question: str, route: str):
+    """Runs the routed retrieval and returns the raw context text.
+
+    A graph stage that overruns its deadline is skipped, falling back to vector search.
+    """
+    if route == "GRAPH_STORE":
+        print(f"   👉 Routing to: Graph Store")
+        result = try_stage("graph", GRAPH_TIMED_OUT, search_graph_rows, query=question)
+        if result is GRAPH_TIMED_OUT:
+            # Neo4j is slow right now: don't send it anything else for this question
+            print("   ⚠️ Graph timed out. Vector only.")
+            return try_stage("vector", VECTOR_TIMEOUT, search_vector, query=question)
+        rows, chunk_ids = result
+        if rows:
+            raw_data = format_graph_rows(rows)
+            # Provenance: the chunks behind these facts, fetched by key
+            support = try_stage("vector", [], fetch_chunks, chunk_ids[:MAX_SUPPORT_CHUNKS])
+            if support:
+                raw_data += "\n\nSUPPORTING TEXT:\n" + format_chunks(support)
+            return raw_data
+        # Ranked search, not the entities' stored chunks: those aren't ordered by the question
+        print("   ⚠️ Graph empty. Fallback to Vector.")
+        return try_stage("vector", VECTOR_TIMEOUT, search_vector, query=question)
+
+    print(f"   👉 Routing to: Vector Store")
+    return try_stage("vector", VECTOR_TIMEOUT, search_vector, query=question)
+
+def retrieve_plan(sub_queries):
+    """Runs independent sub-queries concurrently and merges their deduplicated context.
+
+    Latency is that of the slowest sub-query, not the sum of all of them.
+    """
+    with ThreadPoolExecutor(max_workers=len(sub_queries)) as executor:
+        # Each worker gets a copy of our context so stage deadlines see the current job
+        futures = [
+            executor.submit(contextvars.copy_context().run, retrieve, sq, destination.upper())
+            for sq, destination in sub_queries
+        ]
+        results = [f.result() for f in futures]
+
+    seen = set()
+    sections = []
+    for (sub_question, _), raw_data in zip(sub_queries, results):
+        lines = []
+        for line in raw_data.splitlines():
+            # Facts and chunks shared by several sub-queries are sent only once
+            if line.strip() and line not in seen:
+                seen.add(line)
+                lines.append(line)
+        if lines:
+            sections.append(f"### {sub_question}\n" + "\n".join(lines))
+    return "\n\n".join(sections)
+
+def reuse_session_context(session, question: str, entities):
+    """Answers a follow-up from context earlier turns retrieved.
+
+    Entities the conversation hasn't covered yet are fetched (one indexed seek
+    instead of routing + Cypher generation) only when the cached context
+    already covers the rest of the question. Returns None otherwise.
+    """
+    lines = session.covered(question, entities)
+    if lines is None:
+        return None
+
+    missing = session.missing(entities)
+    if missing:
+        rows, _ = try_stage("graph", ([], []), get_entity_neighbourhood, missing)
+        session.stats["fetched"] += 1
+        for entity in missing:
+            fetched = format_graph_rows([r for r in rows if entity in r]).splitlines()
+            if not fetched:
+                return None
+            session.remember([entity], fetched)
+            lines = lines + fetched
+
+    session.stats["reused"] += 1
+    print(f"   ♻️ Reusing {len(lines)} cached facts for: {entities}")
+    return "\n".join(lines)
+
+def ask_brain(question: str, user_id: str = "Alice", session=None):
+    """Answers one question, booking every model call's tokens to it (core/usage.py).
+
+    Once the per-request token budget runs low, optional calls (planning,
+    routing, Cypher generation) are skipped and the synthesis context is trimmed.
+    """
+    with track_request(persona=user_id) as usage:
+        answer = _answer(question, user_id, session)
+    print(f"   💰 Tokens: {usage.tokens} (${usage.cost:.5f})"
+          + (f", skipped: {', '.join(usage.skipped)}" if usage.skipped else ""))
+    if session is not None:
+        session.stats["tokens"] += usage.tokens
+    return answer
+
+def _answer(question: str, user_id: str, session):
     """
     The Main Engine:
     1. Fetches User Memory (Persona).
-    2. Routes the Question (Graph vs Vector).
-    3. Retrieves Data.
+    2. Resolves follow-ups against the conversation session (if any).
+    3. Plans compound questions into parallel sub-queries, or Routes the
+       Question (Graph vs Vector), and Retrieves Data.
     4. Synthesizes a Personalized Answer.
+
+    Each step runs as a stage with a deadline (core/jobs.py); optional steps
+    that overrun are skipped, so a slow query degrades the answer instead of
+    hanging it.
     """
     print(f"\n🧠 PROCESSING for User: {user_id}")
     
-    # 1. GET MEMORY (The Twist)
-    user_context = get_user_context(user_id)
+    # 1. GET MEMORY (The Twist) -- looked up once per conversation
+    if session is not None and session.persona is not None:
+        user_context = session.persona
+    else:
+        user_context = try_stage("persona", DEFAULT_PERSONA, get_user_context, user_id)
+        # Only a real profile is kept; after an error or timeout the next turn tries again
+        if session is not None and user_context.startswith(PROFILE_HEADER):
+            session.persona = user_context
     print(f"   📄 Context Loaded: {user_context.replace(chr(10), ' ')}") 
     
-    # 2. ROUTE & RETRIEVE
-    # We call route_question and use .upper() to ensure it matches our check
-    route = route_question(question).upper() 
-    raw_data = ""
+    # 2. FOLLOW-UPS: resolve pronouns and reuse what earlier turns fetched
+    raw_data = None
+    follow_up = None
+    search_question = question  # What routing and retrieval see; synthesis gets the user's words
+    # The first call loads the linker from Neo4j; without it we just have no entities
+    entities = try_stage("link", [], link_entities, question)
+    if session is not None:
+        session.stats["turns"] += 1
+        follow_up = session.follow_up_entity(question, entities)
+        if follow_up is not None:
+            search_question = session.resolve(question, follow_up)
+            print(f"   🔗 Follow-up resolved to: '{search_question}'")
+            entities = [follow_up]
+        session.touch(entities)
+        if entities:
+            raw_data = reuse_session_context(session, search_question, entities)
     
-    if route == "GRAPH_STORE":
-        print(f"   👉 Routing to: Graph Store")
-        raw_data = search_graph(query=question)
-        if not raw_data or "I don't know" in str(raw_data):
-            print("   ⚠️ Graph empty. Fallback to Vector.")
-            raw_data = search_vector(query=question)
-    else:
-        print(f"   👉 Routing to: Vector Store")
-        raw_data = search_vector(query=question)
+    # 3. PLAN / ROUTE & RETRIEVE
+    if raw_data is None and needs_decomposition(search_question, entities) and allow_optional("plan"):
+        mentions = try_stage("link", [], link_mentions, search_question)
+        sub_queries = try_stage("plan", [], plan_question, search_question, mentions)
+        if len(sub_queries) > 1:
+            print(f"   🔀 Running {len(sub_queries)} sub-queries in parallel")
+            raw_data = retrieve_plan(sub_queries)
+    if raw_data is None:
+        # We call route_question and use .upper() to ensure it matches our check
+        # A router that overruns defaults to vector search
+        if allow_optional("route"):
+            route = try_stage("route", "vector_store", route_question, search_question).upper() 
+        else:
+            # No budget to ask: linked entities mean a graph question
+            route = "GRAPH_STORE" if entities else "VECTOR_STORE"
+        raw_data = retrieve(search_question, route)
+        if session is not None and entities and not raw_data.startswith(RETRIEVAL_FAILURES):
+            session.remember(entities, raw_data.splitlines())
 
-    # 3. SYNTHESIZE ANSWER (The Agentic Part)
-    # We combine the User Context + The Retrieved Data into one final prompt
-    final_prompt = f"""
-    You are a helpful AI Assistant.
-    
-    {user_context}
-    
-    DATA RETRIEVED:
-    {raw_data}
-    
-    USER QUESTION: {question}
-    
-    Answer the question strictly based on the retrieved data, but ADAPT your tone and depth 
-    to match the User Profile above.
-    """
-    
-    response = llm.invoke(final_prompt)
-    return response.content
\ No newline at end of file
+    # 4. SYNTHESIZE ANSWER (The Agentic Part)
+    # Static instructions + User Context + The Retrieved Data, in that order, so
+    # the prompt prefix stays identical across requests (see core/prompts.py)
+    raw_data = trim_to_budget(raw_data, overhead=user_context + question)
+    response = run_stage("synthesis", synthesizer.invoke, {
+        "user_context": user_context,
+        "raw_data": raw_data,
+        "conversation": f"FOLLOW-UP ABOUT: {follow_up}\n\n" if follow_up else "",
+        "question": question,
+    })
+    return response.content
@@ -0,0 +1,180 @@
+import os
+import glob
+import json
+import hashlib
+import pyarrow as pa
+import pyarrow.compute as pc
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from core.chunks import chunk_id
+
+# --- Configuration ---
+DATA_PATH = "./data"
+CHUNK_STORE_PATH = "./chunk_store"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+CHUNKS_FILE = "chunks.arrow"      # Arrow IPC file: uncompressed, so it can be memory-mapped
+MANIFEST_FILE = "manifest.json"   # source path -> sha256 of the file it was chunked from
+CHANGED_FILES_FILE = "changed_files.json"  # Written into DATA_PATH by download_data.py
+INGESTED_FILE = ".ingested_{}.json"        # Per ingester, in DATA_PATH: source path -> sha256 it last indexed
+
+SCHEMA = pa.schema([
+    ("chunk_id", pa.string()),     # Also the Qdrant point id (see core.chunks)
+    ("source", pa.string()),
+    ("chunk_index", pa.int32()),
+    ("start", pa.int64()),         # Character offsets into the source file
+    ("end", pa.int64()),
+    ("text_sha1", pa.string()),
+    ("text", pa.large_string()),
+])
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _chunk_file(path, splitter):
+    """Splits one source file into store rows."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    rows = []
+    for index, doc in enumerate(splitter.create_documents([text])):
+        start = doc.metadata["start_index"]
+        rows.append({
+            "chunk_id": chunk_id(path, doc.page_content),
+            "source": path,
+            "chunk_index": index,
+            "start": start,
+            "end": start + len(doc.page_content),
+            "text_sha1": hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest(),
+            "text": doc.page_content,
+        })
+    return rows
+
+
+def build_chunk_store(data_path=DATA_PATH, store_path=CHUNK_STORE_PATH):
+    """Chunks new/changed source files into the shared store; unchanged files keep their rows.
+
+    Returns {"changed": [...], "removed": [...]} source paths.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    chunks_path = os.path.join(store_path, CHUNKS_FILE)
+    manifest_path = os.path.join(store_path, MANIFEST_FILE)
+
+    manifest = {}
+    if os.path.exists(manifest_path) and os.path.exists(chunks_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    hashes = {path: _file_sha256(path) for path in sorted(glob.glob(os.path.join(data_path, "*.txt")))}
+    changed = [path for path, digest in hashes.items() if manifest.get(path) != digest]
+    removed = [path for path in manifest if path not in hashes]
+
+    if not changed and not removed:
+        print(f"   - Chunk store up to date ({len(hashes)} files).")
+        return {"changed": [], "removed": []}
+
+    print(f"✂️ Re-chunking {len(changed)} changed files ({len(removed)} removed)...")
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", " ", ""],
+        add_start_index=True,
+    )
+    new_rows = []
+    for path in changed:
+        try:
+            new_rows.extend(_chunk_file(path, splitter))
+        except Exception as e:
+            print(f"   - ⚠️ Error chunking {os.path.basename(path)}: {e}")
+            hashes.pop(path)
+
+    parts = [pa.Table.from_pylist(new_rows, schema=SCHEMA)]
+    if manifest:
+        # Carry over the rows of untouched files without re-splitting them
+        old = open_chunk_store(store_path)
+        stale = pa.array(changed + removed, type=pa.string())
+        parts.insert(0, old.filter(pc.invert(pc.is_in(old["source"], value_set=stale))))
+    table = pa.concat_tables(parts).sort_by([("source", "ascending"), ("chunk_index", "ascending")])
+
+    def write_table(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table)
+
+    def write_manifest(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f, indent=2)
+
+    _write_atomic(chunks_path, write_table)
+    _write_atomic(manifest_path, write_manifest)
+    print(f"   - Chunk store now holds {table.num_rows} chunks from {len(hashes)} files.")
+    return {"changed": changed, "removed": removed}
+
+
+def read_changed_files(data_path=DATA_PATH, ingester=None):
+    """Source files refreshed by download_data.py runs (empty if there was none).
+
+    With `ingester`, only the files it hasn't indexed in their current
+    version, so a repeated --changed-only run doesn't redo (and re-pay for) them.
+    """
+    path = os.path.join(data_path, CHANGED_FILES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        listed = json.load(f)
+    if ingester is None:
+        return listed
+    done = _read_ingested(data_path, ingester)
+    return [p for p in listed if os.path.exists(p) and done.get(p) != _file_sha256(p)]
+
+
+def _read_ingested(data_path, ingester):
+    path = os.path.join(data_path, INGESTED_FILE.format(ingester))
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mark_ingested(ingester, sources, data_path=DATA_PATH):
+    """Records that `ingester` has indexed the current version of these source files."""
+    done = _read_ingested(data_path, ingester)
+    for source in sources:
+        if os.path.exists(source):
+            done[source] = _file_sha256(source)
+
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(done, f, indent=2, sort_keys=True)
+
+    _write_atomic(os.path.join(data_path, INGESTED_FILE.format(ingester)), write)
+
+
+def open_chunk_store(store_path=CHUNK_STORE_PATH):
+    """Memory-maps the chunk table; column buffers point straight into the file (zero-copy)."""
+    source = pa.memory_map(os.path.join(store_path, CHUNKS_FILE), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def chunk_documents(table, sources=None):
+    """Materializes LangChain documents for the indexers, optionally for some sources only."""
+    if sources is not None:
+        table = table.filter(pc.is_in(table["source"], value_set=pa.array(list(sources), type=pa.string())))
+    return [
+        Document(
+            page_content=row["text"],
+            metadata={"source": row["source"], "chunk_id": row["chunk_id"], "start_index": row["start"]},
+        )
+        for row in table.select(["chunk_id", "source", "start", "text"]).to_pylist()
+    ]
@@ -0,0 +1,12 @@
+import os
+import uuid
+
+# Fixed namespace so every indexer derives the same id for the same chunk.
+# The ids double as Qdrant point ids, which must be UUIDs or integers.
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a0e-8b5d-4c1e-9a57-3d2f0b7e4c11")
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Returns the stable id of a chunk, derived from its file name and text."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{os.path.basename(source)}\n{text}"))
+
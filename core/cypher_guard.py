@@ -0,0 +1,164 @@
+import re
+from langchain_community.chains.graph_qa.cypher_utils import CypherQueryCorrector
+
+# --- Configuration ---
+MAX_PATH_HOPS = 3               # Upper bound forced onto variable-length relationships
+MAX_ESTIMATED_ROWS = 100_000    # Largest planner row estimate allowed at any operator
+EXPLAIN_TIMEOUT = 5             # Seconds; planning only, nothing is executed
+
+# Generated Cypher is read-only: these clauses never run
+# (not after a `.`: `n.use` or `n.set` is property access)
+WRITE_CLAUSE_RE = re.compile(
+    r"(?<!\.)\b(CREATE|MERGE|DELETE|DETACH|SET|REMOVE|DROP|FOREACH|LOAD\s+CSV|USE)\b", re.IGNORECASE
+)
+# Procedure calls (not `CALL {` subqueries) must be on this list, with or without parentheses
+PROCEDURE_RE = re.compile(r"\bCALL\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+ALLOWED_PROCEDURES = {"db.index.fulltext.querynodes"}
+# Any apoc.* call, procedure or function, may write or run arbitrary Cypher
+APOC_RE = re.compile(r"\bapoc\s*\.", re.IGNORECASE)
+
+# `*`, `*2`, `*..3`, `*1..`, `*1..5` inside a relationship pattern `-[...]-`
+# (not in list expressions like `[x IN xs | x * 5]`)
+VAR_LENGTH_RE = re.compile(r"(-\[[^\]]*?)\*\s*(\d*)\s*(\.\.)?\s*(\d*)([^\]]*\]-)")
+LIMIT_RE = re.compile(r"\bLIMIT\s+(\S+)\s*$", re.IGNORECASE)
+RETURN_RE = re.compile(r"\bRETURN\b", re.IGNORECASE)
+UNION_RE = re.compile(r"\bUNION\b", re.IGNORECASE)
+# String literals and comments are masked before keyword checks ('Set-top box' is not a SET)
+LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+class UnsafeCypherError(ValueError):
+    """Raised for generated Cypher the guard refuses to run."""
+
+
+def _mask_literals(query: str) -> str:
+    """Blanks string literals/comments keeping offsets, so regexes only see Cypher syntax."""
+    return LITERAL_RE.sub(lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 2) + m.group(0)[-1], query)
+
+
+def _strip_comments(query: str) -> str:
+    """Removes comments (outside string literals), so clauses can be found at the query's end."""
+    return LITERAL_RE.sub(lambda m: "" if m.group(0).startswith(("//", "/*")) else m.group(0), query)
+
+
+def check_read_only(query: str):
+    masked = _mask_literals(query)
+    write = WRITE_CLAUSE_RE.search(masked)
+    if write:
+        raise UnsafeCypherError(f"write clause {write.group(1).upper()} is not allowed")
+    if APOC_RE.search(masked):
+        raise UnsafeCypherError("APOC calls are not allowed")
+    for procedure in PROCEDURE_RE.findall(masked):
+        if procedure.lower() not in ALLOWED_PROCEDURES:
+            raise UnsafeCypherError(f"procedure {procedure} is not allowed")
+
+
+def bound_path_lengths(query: str, max_hops: int = MAX_PATH_HOPS) -> str:
+    """Rewrites unbounded or over-long variable-length relationships to at most `max_hops`."""
+    masked = _mask_literals(query)
+    parts, cursor = [], 0
+    for m in VAR_LENGTH_RE.finditer(masked):
+        low, dots, high = m.group(2), m.group(3), m.group(4)
+        if dots:
+            lower = int(low) if low else 1
+            upper = min(int(high), max_hops) if high else max_hops
+        elif low:
+            lower = upper = min(int(low), max_hops)  # `*n` is exactly n hops
+        else:
+            lower, upper = 1, max_hops               # bare `*`
+        lower = min(lower, upper)
+        bounded = f"*{lower}..{upper}" if lower != upper else f"*{lower}"
+        # Splice the rewrite into the original text (offsets match the masked copy)
+        star_start = m.start() + len(m.group(1))
+        star_end = m.end() - len(m.group(5))
+        parts.append(query[cursor:star_start] + bounded)
+        cursor = star_end
+    parts.append(query[cursor:])
+    return "".join(parts)
+
+
+def enforce_limit(query: str, limit: int) -> str:
+    """Adds `LIMIT limit` to the final RETURN, or lowers a larger one."""
+    # A trailing comment would hide an existing LIMIT, and swallow an appended one
+    query = _strip_comments(query).strip().rstrip(";").rstrip()
+    masked = _mask_literals(query)
+    if UNION_RE.search(masked):
+        # A trailing LIMIT would only bound the last branch; bound the union instead
+        return f"CALL {{\n{query}\n}}\nRETURN *\nLIMIT {limit}"
+    returns = list(RETURN_RE.finditer(masked))
+    if not returns:
+        raise UnsafeCypherError("query has no RETURN clause")
+    tail = masked[returns[-1].end():]
+    existing = LIMIT_RE.search(tail)
+    if existing is None:
+        return f"{query}\nLIMIT {limit}"
+    value = existing.group(1)
+    if value.isdigit() and int(value) <= limit:
+        return query
+    start = returns[-1].end() + existing.start(1)
+    return query[:start] + str(limit) + query[start + len(value):]
+
+
+def _walk(plan):
+    yield plan
+    for child in plan.get("children", []):
+        yield from _walk(child)
+
+
+def check_plan(plan, max_rows: int = MAX_ESTIMATED_ROWS):
+    """Rejects an EXPLAIN plan with a cartesian product or a too-large row estimate."""
+    for operator in _walk(plan):
+        name = operator.get("operatorType", "")
+        if name.startswith("CartesianProduct"):
+            raise UnsafeCypherError("plan contains a cartesian product")
+        estimated = operator.get("args", operator.get("arguments", {})).get("EstimatedRows", 0)
+        if estimated > max_rows:
+            raise UnsafeCypherError(f"{name} estimates {estimated:,.0f} rows (max {max_rows:,})")
+
+
+class CypherGuard(CypherQueryCorrector):
+    """Vets LLM-generated Cypher before GraphCypherQAChain runs it.
+
+    Plugged in as the chain's `cypher_query_corrector`: the query is checked
+    for write clauses, its variable-length paths are bounded, a LIMIT is
+    added, and EXPLAIN must show a plan without cartesian products or huge
+    row estimates. A rejected query comes back as "", which the chain treats
+    as no result.
+    """
+
+    def __init__(self, graph, limit: int, max_hops: int = MAX_PATH_HOPS, max_rows: int = MAX_ESTIMATED_ROWS):
+        super().__init__(schemas=[])
+        self.graph = graph
+        self.limit = limit
+        self.max_hops = max_hops
+        self.max_rows = max_rows
+        self.stats = {"checked": 0, "rewritten": 0, "rejected": 0}
+
+    def explain(self, query: str):
+        from neo4j import Query
+        _, summary, _ = self.graph._driver.execute_query(
+            Query(text="EXPLAIN " + query, timeout=EXPLAIN_TIMEOUT),
+            database_=self.graph._database,
+        )
+        return summary.plan
+
+    def guard(self, query: str) -> str:
+        """Returns the query to run; raises UnsafeCypherError if it must not run."""
+        check_read_only(query)
+        guarded = enforce_limit(bound_path_lengths(query, self.max_hops), self.limit)
+        check_plan(self.explain(guarded), self.max_rows)
+        return guarded
+
+    def correct_query(self, query: str) -> str:
+        self.stats["checked"] += 1
+        try:
+            guarded = self.guard(query)
+        except Exception as e:
+            # Unsafe, or EXPLAIN failed (e.g. a syntax error): don't run it
+            self.stats["rejected"] += 1
+            print(f"   🛡️ Cypher rejected: {e}")
+            return ""
+        if guarded != query.strip():
+            self.stats["rewritten"] += 1
+            print(f"   🛡️ Cypher rewritten: {' '.join(guarded.split())}")
+        return guarded
@@ -0,0 +1,154 @@
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from dotenv import load_dotenv
+from core.usage import record_usage, estimate_tokens
+
+load_dotenv()
+
+# --- Configuration ---
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")  # "openai" or "local"
+LOCAL_MODEL_PATH = os.getenv("LOCAL_EMBEDDING_MODEL")  # Optional .npz weights; defaults to the bundled model
+LOCAL_BATCH_SIZE = 64
+LOCAL_THREADS = os.cpu_count() or 1
+
+
+class EmbeddingProvider(Embeddings):
+    """A LangChain `Embeddings` that also declares its model name and vector size.
+
+    The signature is stored with the Qdrant collection at ingestion time so
+    queries embedded by a different model are caught instead of silently
+    returning nonsense neighbours.
+    """
+
+    name = "unknown"
+    dimension = 0
+
+    def signature(self):
+        return {"embedding_model": self.name, "embedding_dim": self.dimension}
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Remote embeddings through the OpenAI API (one network round trip per call)."""
+
+    name = "text-embedding-ada-002"
+    dimension = 1536
+
+    def __init__(self):
+        self._client = OpenAIEmbeddings(model=self.name)
+        self._encoding = None  # False once tiktoken failed to load (e.g. offline); don't retry
+
+    def _count_tokens(self, texts):
+        """Token count for usage accounting (the embeddings client doesn't report it)."""
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.name)
+            except Exception as e:
+                print(f"   ⚠️ tiktoken unavailable ({e}); estimating embedding tokens")
+                self._encoding = False
+        if self._encoding is False:
+            return sum(estimate_tokens(t) for t in texts)
+        return sum(len(self._encoding.encode(t)) for t in texts)
+
+    def embed_documents(self, texts):
+        vectors = self._client.embed_documents(texts)
+        record_usage("embed_documents", self.name, self._count_tokens(texts))
+        return vectors
+
+    def embed_query(self, text):
+        vector = self._client.embed_query(text)
+        record_usage("embed_query", self.name, self._count_tokens([text]))
+        return vector
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """CPU embedding model: hashed unigram+bigram features projected by a dense matrix.
+
+    Inference for a batch is one (batch x buckets) @ (buckets x dim) matmul,
+    so NumPy/BLAS does the work and releases the GIL; batches run on a thread
+    pool. Outputs are L2-normalized, ready for cosine distance.
+
+    Without a weights file the bundled model is generated from a fixed seed,
+    so it is fully deterministic and needs no download (useful for tests and
+    offline runs). A real model's token embedding table can be exported to an
+    .npz with `weights` (buckets x dim) and an optional `name`.
+    """
+
+    BUNDLED_NAME = "local-hash-bigram-256"
+    BUNDLED_BUCKETS = 2 ** 13
+    BUNDLED_DIM = 256
+    BUNDLED_SEED = 20240611
+
+    def __init__(self, model_path=None, batch_size=LOCAL_BATCH_SIZE, num_threads=LOCAL_THREADS):
+        if model_path:
+            data = np.load(model_path)
+            self.weights = np.ascontiguousarray(data["weights"], dtype=np.float32)
+            self.name = str(data["name"]) if "name" in data else os.path.basename(model_path)
+        else:
+            rng = np.random.default_rng(self.BUNDLED_SEED)
+            self.weights = rng.standard_normal((self.BUNDLED_BUCKETS, self.BUNDLED_DIM), dtype=np.float32)
+            self.name = self.BUNDLED_NAME
+        self.buckets, self.dimension = self.weights.shape
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+
+    def _features(self, text):
+        """Hashes unigrams and bigrams of a text to bucket ids (crc32 is stable across runs)."""
+        words = re.findall(r"\w+", text.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return [zlib.crc32(g.encode("utf-8")) % self.buckets for g in grams]
+
+    def _embed_batch(self, texts):
+        counts = np.zeros((len(texts), self.buckets), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = self._features(text)
+            if ids:
+                counts[row] += np.bincount(ids, minlength=self.buckets)
+        # Sublinear term frequency, then project and normalize
+        vectors = np.log1p(counts, out=counts) @ self.weights
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_array(self, texts):
+        """Embeds texts into an (n x dim) float32 array."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.num_threads > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+                return np.vstack(list(executor.map(self._embed_batch, batches)))
+        return np.vstack([self._embed_batch(b) for b in batches])
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+_provider = None
+
+def get_embeddings(provider: str = None):
+    """Returns the configured embedding provider (shared per process for the default)."""
+    global _provider
+    if provider is None and _provider is not None:
+        return _provider
+
+    kind = provider or EMBEDDING_PROVIDER
+    if kind == "local":
+        instance = LocalEmbeddingProvider(LOCAL_MODEL_PATH)
+    elif kind == "openai":
+        instance = OpenAIEmbeddingProvider()
+    else:
+        raise ValueError(f"Unknown embedding provider: {kind!r}")
+
+    if provider is None:
+        _provider = instance
+    return instance
@@ -0,0 +1,121 @@
+import re
+from collections import deque
+
+# Suffixes stripped to build short aliases ("Tesla, Inc." -> "tesla")
+CORPORATE_SUFFIXES = (
+    "inc", "incorporated", "corp", "corporation", "company", "co",
+    "ltd", "limited", "plc", "llc", "group", "holdings", "platforms",
+)
+# Aliases that would match ordinary words in a question
+STOP_ALIASES = {"it", "its", "the", "who", "what", "ceo", "company", "person"}
+MIN_ALIAS_LENGTH = 2
+
+
+def normalize(text: str) -> str:
+    """Lowercases, drops possessives/punctuation and pads with spaces for word boundaries."""
+    text = re.sub(r"['’]s\b", "", text.lower())
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return f" {' '.join(text.split())} "
+
+
+def aliases_for(entity_id: str):
+    """Returns the normalized surface forms an entity can be mentioned by."""
+    full = normalize(entity_id).strip()
+    # "Amazon (company)" -> "amazon"
+    no_parens = normalize(re.sub(r"\([^)]*\)", " ", entity_id)).strip()
+    aliases = {full, no_parens}
+
+    words = no_parens.split()
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words = words[:-1]
+        aliases.add(" ".join(words))
+
+    return {a for a in aliases if len(a) >= MIN_ALIAS_LENGTH and a not in STOP_ALIASES}
+
+
+class EntityLinker:
+    """Aho-Corasick automaton over canonical entity ids and their aliases.
+
+    One pass over the question finds every known entity mention, so graph
+    queries can start from exact (indexed) ids instead of CONTAINS scans.
+    """
+
+    def __init__(self, entities=(), aliases=None):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._canonical = {}
+
+        for entity_id in entities:
+            for alias in aliases_for(entity_id):
+                self._add(alias, entity_id)
+        for alias, entity_id in (aliases or {}).items():
+            self._add(normalize(alias).strip(), entity_id)
+
+        self._build()
+
+    def __len__(self):
+        return len(self._canonical)
+
+    def _add(self, alias: str, entity_id: str):
+        if not alias:
+            return
+        # An exact id always wins over a derived alias of another entity
+        current = self._canonical.get(alias)
+        if current is not None and normalize(current).strip() == alias:
+            return
+        self._canonical[alias] = entity_id
+
+        state = 0
+        for ch in f" {alias} ":
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        if alias not in self._out[state]:
+            self._out[state].append(alias)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def mentions(self, text: str):
+        """Returns (start, stop, entity_id) spans over `normalize(text)`, longest match first, in reading order."""
+        haystack = normalize(text)
+        matches = []
+        state = 0
+        for end, ch in enumerate(haystack):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for alias in self._out[state]:
+                # Spans exclude the padding spaces so adjacent mentions don't overlap
+                matches.append((end - len(alias), end, alias))
+
+        # Keep the longest non-overlapping mentions ("meta platforms" over "meta")
+        matches.sort(key=lambda m: (-(m[1] - m[0]), m[0]))
+        taken = []
+        for start, stop, alias in matches:
+            if all(stop <= s or start >= e for s, e, _ in taken):
+                taken.append((start, stop, alias))
+        return [(start, stop, self._canonical[alias]) for start, stop, alias in sorted(taken)]
+
+    def find(self, text: str):
+        """Returns the canonical ids mentioned in `text`, in reading order."""
+        found = []
+        for _, _, entity_id in self.mentions(text):
+            if entity_id not in found:
+                found.append(entity_id)
+        return found
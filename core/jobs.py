@@ -0,0 +1,210 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# --- Configuration ---
+MAX_WORKERS = 4        # Questions answered at the same time
+MAX_PENDING = 8        # Questions allowed to wait for a worker; beyond this submit() fails fast
+MAX_STAGES_PER_JOB = 6 # Stages one question may run at once (its planned sub-queries)
+JOB_DEADLINE = 90      # Seconds for a whole question, all stages included
+LLM_TIMEOUT = 30       # Seconds per OpenAI request (the client otherwise waits up to 10 minutes)
+POLL_INTERVAL = 0.1    # How often a waiting stage checks for cancellation
+
+# Seconds each pipeline stage may take before the pipeline degrades around it
+STAGE_DEADLINES = {
+    "persona": 5,
+    "link": 10,
+    "plan": 15,
+    "route": 10,
+    "graph": 20,
+    "vector": 10,
+    "synthesis": 45,
+}
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when every worker and pending slot is taken."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it has been cancelled (e.g. the user left)."""
+
+
+class StageTimeout(TimeoutError):
+    """Raised when a stage, or the job as a whole, overruns its deadline."""
+
+
+class Job:
+    """One submitted question: its future, cancel flag and deadline."""
+
+    def __init__(self, deadline: float = JOB_DEADLINE):
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.monotonic()
+        self.deadline = self.submitted_at + deadline
+        self.stage = "queued"
+        self.timeouts = []  # Stages that overran and were degraded around
+        self.future = None
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def cancel(self):
+        """Stops the job at its next stage boundary (or before it starts, if still queued)."""
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(f"cancelled during {self.stage}")
+        if self.remaining() <= 0:
+            raise StageTimeout(f"job deadline exceeded during {self.stage}")
+
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+# Stage calls run here so the caller can stop waiting on them. A thread can't be
+# killed, so an overrunning call finishes in the background; the LLM and database
+# client timeouts bound how long that takes. Sized for every job's parallel stages,
+# twice over, so those leftovers don't starve new stages of threads.
+_stage_executor = ThreadPoolExecutor(
+    max_workers=MAX_WORKERS * MAX_STAGES_PER_JOB * 2, thread_name_prefix="stage"
+)
+
+
+def current_job():
+    """The job the calling code runs under, or None outside the queue."""
+    return _current_job.get()
+
+
+def run_stage(name: str, fn, *args, **kwargs):
+    """Runs one pipeline stage under its deadline.
+
+    The stage's deadline counts from when it starts running, so time spent
+    waiting for a stage thread isn't charged to it (the job deadline still
+    is). Raises StageTimeout on overrun and JobCancelled if the surrounding
+    job is cancelled while waiting. Context variables (the current job, ...)
+    are carried into the stage thread.
+    """
+    job = current_job()
+    timeout = STAGE_DEADLINES.get(name, JOB_DEADLINE)
+    if job is not None:
+        job.check()
+        job.stage = name
+
+    started = []
+    def call():
+        started.append(time.monotonic())
+        return fn(*args, **kwargs)
+
+    ctx = contextvars.copy_context()
+    future = _stage_executor.submit(ctx.run, call)
+    while True:
+        stage_end = started[0] + timeout if started else float("inf")
+        end = min(stage_end, job.deadline) if job is not None else stage_end
+        done, _ = wait([future], timeout=max(0.0, min(POLL_INTERVAL, end - time.monotonic())))
+        if done:
+            return future.result()
+        if job is not None and job.cancelled:
+            future.cancel()
+            raise JobCancelled(f"cancelled during {name}")
+        if time.monotonic() >= end:
+            future.cancel()
+            if job is not None:
+                job.timeouts.append(name)
+            if end == stage_end:
+                raise StageTimeout(f"stage '{name}' exceeded {timeout:.1f}s")
+            raise StageTimeout(f"job deadline exceeded during {name}")
+
+
+def try_stage(name: str, fallback, fn, *args, **kwargs):
+    """Like run_stage, but returns `fallback` when the stage overruns."""
+    try:
+        return run_stage(name, fn, *args, **kwargs)
+    except StageTimeout as e:
+        print(f"   ⏱️ {e}. Degrading.")
+        return fallback
+
+
+class JobQueue:
+    """Bounded worker pool for questions.
+
+    At most MAX_WORKERS jobs run and MAX_PENDING wait; further submissions are
+    rejected with QueueFullError instead of piling up behind a slow query.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self.stats = {
+            "submitted": 0, "rejected": 0, "completed": 0, "failed": 0,
+            "cancelled": 0, "timed_out": 0, "degraded_stages": 0,
+        }
+
+    def submit(self, fn, *args, deadline: float = JOB_DEADLINE, **kwargs):
+        """Queues fn(*args, **kwargs) as a Job; raises QueueFullError when saturated."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise QueueFullError("too many questions in flight")
+
+        job = Job(deadline)
+        ctx = contextvars.copy_context()
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._queued += 1
+        job.future = self._executor.submit(self._run, job, ctx, fn, args, kwargs)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def _run(self, job, ctx, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            job.check()
+            return ctx.run(self._run_in_context, job, fn, args, kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    @staticmethod
+    def _run_in_context(job, fn, args, kwargs):
+        _current_job.set(job)
+        job.stage = "started"
+        return fn(*args, **kwargs)
+
+    def _finish(self, job, future):
+        self._slots.release()
+        with self._lock:
+            self.stats["degraded_stages"] += len(job.timeouts)
+            if future.cancelled():
+                # Cancelled while still queued: _run never ran to decrement it
+                self._queued -= 1
+                self.stats["cancelled"] += 1
+                return
+            error = future.exception()
+            if error is None:
+                self.stats["completed"] += 1
+            elif isinstance(error, JobCancelled):
+                self.stats["cancelled"] += 1
+            elif isinstance(error, StageTimeout):
+                self.stats["timed_out"] += 1
+            else:
+                self.stats["failed"] += 1
+
+    def snapshot(self):
+        """Queue depth, running jobs and counters, for display."""
+        with self._lock:
+            return {"queued": self._queued, "running": self._running, **self.stats}
@@ -0,0 +1,108 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Literal
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
+from core.entity_linker import normalize
+from core.jobs import LLM_TIMEOUT, MAX_STAGES_PER_JOB
+from core.prompts import PLAN_PROMPT
+from core.usage import UsageCallback
+
+PLAN_CACHE_SIZE = 256
+MAX_SUB_QUERIES = MAX_STAGES_PER_JOB  # Each sub-query runs as a parallel stage
+
+# Only compound questions about several entities are worth a planning call.
+# "between" is left out on purpose: "relationship between A and B" is one graph lookup.
+COMPOUND_RE = re.compile(r"\b(compare|comparison|versus|vs|each|both|respectively|difference)\b", re.IGNORECASE)
+PLACEHOLDER_RE = re.compile(r"ENTITY_(\d+)")
+
+
+# 1. Define the Output Structure (The Plan)
+class SubQuery(BaseModel):
+    """One independent lookup."""
+    question: str = Field(..., description="A self-contained question about a single fact or entity.")
+    destination: Literal["vector_store", "graph_store"] = Field(
+        ...,
+        description="'graph_store' for entities, relationships, ownership or roles; 'vector_store' for summaries, history or broad concepts."
+    )
+
+class QueryPlan(BaseModel):
+    """Independent sub-queries whose results together answer the question."""
+    sub_queries: List[SubQuery]
+
+
+# Compiled once; see core/prompts.py
+planner_llm = ChatOpenAI(
+    model="gpt-4o-mini", temperature=0, timeout=LLM_TIMEOUT, max_retries=1,
+    callbacks=[UsageCallback("plan")]
+)
+planner = PLAN_PROMPT.partial(max_sub_queries=str(MAX_SUB_QUERIES)) | planner_llm.with_structured_output(QueryPlan)
+
+_plan_cache = OrderedDict()  # question shape -> [(templated sub-question, destination), ...]
+_plan_lock = threading.Lock()
+
+
+def needs_decomposition(question: str, entities) -> bool:
+    """Cheap gate: several entities plus comparison wording."""
+    return len(entities) >= 2 and bool(COMPOUND_RE.search(question))
+
+
+def question_shape(question: str, mentions):
+    """Replaces entity mentions with ENTITY_i placeholders.
+
+    `mentions` are spans from EntityLinker.mentions(); returns (shape, entity ids by placeholder).
+    "Compare Nvidia's and AMD's acquisitions" and the same question about Intel and Qualcomm
+    share the shape "compare ENTITY_0 and ENTITY_1 acquisitions", and so share a plan.
+    """
+    text = normalize(question)
+    entities = []
+    parts = []
+    cursor = 0
+    for start, stop, entity_id in mentions:
+        if entity_id not in entities:
+            entities.append(entity_id)
+        parts.append(text[cursor:start])
+        parts.append(f"ENTITY_{entities.index(entity_id)}")
+        cursor = stop
+    parts.append(text[cursor:])
+    return "".join(parts).strip(), entities
+
+
+def _generate_plan(shape: str):
+    plan = planner.invoke({"question": shape})
+    return [(sq.question, sq.destination) for sq in plan.sub_queries[:MAX_SUB_QUERIES]]
+
+
+def plan_question(question: str, mentions):
+    """Returns [(sub-question, destination), ...] for a compound question, reusing cached plans by shape.
+
+    Planning is optional: if the planner call fails (API error, unparseable
+    output) this returns [] and the caller routes the question as a whole.
+    """
+    shape, entities = question_shape(question, mentions)
+
+    with _plan_lock:
+        template = _plan_cache.get(shape)
+        if template is not None:
+            _plan_cache.move_to_end(shape)
+    if template is None:
+        print(f"🗺️ Planning: '{shape}'")
+        try:
+            template = _generate_plan(shape)
+        except Exception as e:
+            print(f"   ⚠️ Planner failed ({e}). Falling back to a single route.")
+            return []
+        with _plan_lock:
+            _plan_cache[shape] = template
+            while len(_plan_cache) > PLAN_CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+    else:
+        print(f"🗺️ Plan cache hit: '{shape}'")
+
+    def fill(text):
+        return PLACEHOLDER_RE.sub(
+            lambda m: entities[int(m.group(1))] if int(m.group(1)) < len(entities) else m.group(0), text
+        )
+
+    return [(fill(q), destination) for q, destination in template]
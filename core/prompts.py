@@ -0,0 +1,91 @@
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+
+# All prompts are compiled once at import. Each one starts with its long static
+# instructions and ends with the per-request parts, so the prefix sent to the
+# provider is byte-identical across requests and can hit prompt caching.
+
+# --- 1. Router ---
+# The System Prompt works as the "Brain's Instructions"
+ROUTER_SYSTEM = """You are an expert at routing user questions to a vectorstore or graph database.
+    
+    Use the GRAPH_STORE for:
+    - Questions about relationships (e.g., "Who is the CEO of X?", "Does A own B?", "How is X connected to Y?")
+    - Questions involving specific entities (companies, people) and their connections.
+    
+    Use the VECTOR_STORE for:
+    - Questions asking for summaries (e.g., "Summarize the history of Apple")
+    - Broad conceptual questions (e.g., "What is generative AI?", "Risks of cloud computing")
+    """
+
+ROUTE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", ROUTER_SYSTEM),
+        ("human", "{question}"),
+    ]
+)
+
+# --- 2. Cypher Generation ---
+CYPHER_GENERATION_TEMPLATE = """
+You are an expert Neo4j Cypher translator.
+**CRITICAL RULES:**
+1. **ANCHORS:** The anchor entities below are exact node ids. Start the pattern from them with an indexed match on `:__Entity__`.
+   - Correct: `MATCH (a:__Entity__ {{id: 'Tesla'}})`
+2. **NO ANCHORS:** If the anchor list is empty, find the entity through the fulltext index instead of scanning nodes.
+   - Correct: `CALL db.index.fulltext.queryNodes('entity_ids', 'tesla') YIELD node AS a`
+   - **NEVER** use `CONTAINS` or `toLower` on `id`; they scan every node.
+3. **RELATIONSHIPS:** **NEVER** use a colon `:` or type check inside the query.
+   - Wrong: `-[r:CEO_OF]-` 
+   - Correct: `-[r]-` (Match ANY relationship)
+4. **RETURN:** Always return the nodes, the relationship type AND the relationship's source chunks.
+   - Example: `RETURN p, type(r) as relationship, c, r.source_chunks as sources`
+5. **TARGET FILTERING:** If the question implies a specific entity type (e.g. "Who" -> Person, "Company" -> Company), add that label to the target node to filter out noise.
+   - Question: "Who is the CEO of Tesla?"
+   - Correct: `MATCH (c:__Entity__ {{id: 'Tesla'}})-[r]-(p:Person)`
+
+Schema:
+Node properties: [id]
+Common Relationships: OWNS, CEO_OF, PARTNERED_WITH, COMPETES_WITH, ACQUIRED, SUBSIDIARY_OF
+
+Anchor entities: {anchors}
+Question: {question}
+Cypher Query:"""
+
+CYPHER_PROMPT = PromptTemplate(
+    input_variables=["question", "anchors"], 
+    template=CYPHER_GENERATION_TEMPLATE
+)
+
+# --- 3. Query Planner ---
+PLANNER_SYSTEM = """You split a user question into independent sub-queries that can run in parallel.
+
+    Rules:
+    - Each sub-query must be answerable on its own with ONE lookup (no sub-query may depend on another's answer).
+    - Keep the ENTITY_0, ENTITY_1, ... placeholders exactly as written; never invent entity names.
+    - Use one sub-query per entity and per fact asked for (e.g. acquisitions of ENTITY_0, CEO of ENTITY_0, ...).
+    - Route relationship, ownership and role questions to graph_store; summaries and history to vector_store.
+    - Produce at most {max_sub_queries} sub-queries.
+    """
+
+PLAN_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", PLANNER_SYSTEM),
+        ("human", "{question}"),
+    ]
+)
+
+# --- 4. Answer Synthesis ---
+# Static instructions first; the user profile (stable per user) next; the
+# retrieved data and question (different every time) last.
+SYNTHESIS_SYSTEM = """You are a helpful AI Assistant.
+
+Answer the USER QUESTION strictly based on the DATA RETRIEVED, but ADAPT your tone and depth
+to match the User Profile. When you rely on SUPPORTING TEXT, cite its [source]."""
+
+# `conversation` is empty except on follow-ups, where it names the entity the
+# user's own wording refers back to.
+SYNTHESIS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYNTHESIS_SYSTEM),
+        ("human", "{user_context}\n\nDATA RETRIEVED:\n{raw_data}\n\n{conversation}USER QUESTION: {question}"),
+    ]
+).partial(conversation="")
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import threading
+
+# Relationship types the cache materializes chains over
+CHAIN_TYPES = ("OWNS", "SUBSIDIARY_OF", "CEO_OF", "ACQUIRED")
+
+# Each stored edge (source)-[TYPE]->(target) becomes two directed hops,
+# so "parent of X" is the same lookup whether the graph says OWNS or SUBSIDIARY_OF
+HOPS = {
+    "OWNS": (("HAS_PARENT", "target", "source"), ("HAS_SUBSIDIARY", "source", "target")),
+    "ACQUIRED": (("HAS_PARENT", "target", "source"), ("HAS_SUBSIDIARY", "source", "target")),
+    "SUBSIDIARY_OF": (("HAS_PARENT", "source", "target"), ("HAS_SUBSIDIARY", "target", "source")),
+    "CEO_OF": (("HAS_CEO", "target", "source"), ("IS_CEO_OF", "source", "target")),
+}
+INVERSE = {
+    "HAS_PARENT": "HAS_SUBSIDIARY",
+    "HAS_SUBSIDIARY": "HAS_PARENT",
+    "HAS_CEO": "IS_CEO_OF",
+    "IS_CEO_OF": "HAS_CEO",
+}
+
+# The 2-hop chains worth precomputing
+CHAINS = (
+    ("HAS_PARENT", "HAS_CEO"),         # CEO of the parent company of X
+    ("HAS_PARENT", "HAS_PARENT"),      # parent of the parent company of X
+    ("HAS_SUBSIDIARY", "HAS_CEO"),     # CEOs of the companies X owns
+    ("IS_CEO_OF", "HAS_SUBSIDIARY"),   # companies owned by the company X leads
+)
+
+# Question wording -> chain; the anchor entity is the chain's start
+QUESTION_SHAPES = (
+    (re.compile(r"\b(ceo|chief executive|leads?|runs?)\b.*\bparent\b", re.I), CHAINS[0]),
+    (re.compile(r"\bparent\b.*\bparent\b", re.I), CHAINS[1]),
+    (re.compile(r"\b(ceos?|chief executives?|leads?|runs?)\b.*\b(subsidiar\w*|acquisitions?|companies (owned|acquired|bought))\b", re.I), CHAINS[2]),
+    (re.compile(r"\b(subsidiar\w*|acquisitions?|companies (owned|acquired|bought))\b.*\b(led|run|headed) by\b", re.I), CHAINS[3]),
+)
+
+
+class RelationCache:
+    """In-process lookup of materialized 2-hop relationship chains.
+
+    Built from the typed edges in CHAIN_TYPES and refreshed incrementally:
+    adding an edge only re-materializes the chains that can pass through it.
+    """
+
+    def __init__(self, edges=()):
+        self._lock = threading.Lock()
+        self._edges = set()
+        self._hops = {}    # (hop, entity) -> set of neighbour ids
+        self._chains = {}  # (hop1, hop2, entity) -> [(middle, target), ...]
+        self.add_edges(edges)
+
+    def __len__(self):
+        return len(self._chains)
+
+    def add_edges(self, edges):
+        """Adds (source, type, target) edges and refreshes affected chains; returns the new edge count."""
+        with self._lock:
+            touched = set()
+            added = 0
+            for source, rel_type, target in edges:
+                edge = (source, rel_type, target)
+                if rel_type not in HOPS or source == target or edge in self._edges:
+                    continue
+                self._edges.add(edge)
+                added += 1
+                ends = {"source": source, "target": target}
+                for hop, start, end in HOPS[rel_type]:
+                    a, b = ends[start], ends[end]
+                    self._hops.setdefault((hop, a), set()).add(b)
+                    touched.add(a)
+            # Chains starting at a touched entity, or reaching it on their first hop
+            affected = set(touched)
+            for entity in touched:
+                for hop in INVERSE:
+                    affected.update(self._hops.get((hop, entity), ()))
+            for entity in affected:
+                self._materialize(entity)
+            return added
+
+    def _materialize(self, entity):
+        for hop1, hop2 in CHAINS:
+            pairs = sorted(
+                (middle, target)
+                for middle in self._hops.get((hop1, entity), ())
+                for target in self._hops.get((hop2, middle), ())
+                if target != entity
+            )
+            if pairs:
+                self._chains[(hop1, hop2, entity)] = pairs
+            else:
+                self._chains.pop((hop1, hop2, entity), None)
+
+    def lookup(self, hop1: str, hop2: str, entity: str):
+        """Returns the (middle, target) pairs reachable from `entity` along hop1 then hop2."""
+        return self._chains.get((hop1, hop2, entity), [])
+
+    def answer(self, question: str, anchors):
+        """Answers a recognised multi-hop question shape with compact rows, or [] if it can't."""
+        for pattern, (hop1, hop2) in QUESTION_SHAPES:
+            if not pattern.search(question):
+                continue
+            rows = []
+            for anchor in anchors:
+                for middle, target in self.lookup(hop1, hop2, anchor):
+                    rows.append((anchor, hop1, middle))
+                    rows.append((middle, hop2, target))
+            if rows:
+                return list(dict.fromkeys(rows))
+        return []
+
+    # --- Persistence (shared between ingestion and the app) ---
+
+    def save(self, path: str):
+        """Writes the raw edges atomically; chains are re-derived on load."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sorted(self._edges), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            return cls(tuple(edge) for edge in json.load(f))
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Builds the cache from the typed relationships currently in Neo4j."""
+        data = graph.query(
+            """
+            MATCH (a)-[r]->(b) WHERE type(r) IN $types
+            RETURN a.id AS source, type(r) AS type, b.id AS target
+            """,
+            {"types": list(CHAIN_TYPES)},
+        )
+        return cls((row["source"], row["type"], row["target"]) for row in data)
@@ -1,32 +1,100 @@
 import os
+import time
+import threading
 import requests
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain_community.graphs import Neo4jGraph
-from langchain_core.prompts import PromptTemplate
+from core.jobs import LLM_TIMEOUT
+from core.prompts import CYPHER_PROMPT
 from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain
 from dotenv import load_dotenv
+from core.entity_linker import EntityLinker
+from core.relation_cache import RelationCache, CHAIN_TYPES
+from core.embeddings import get_embeddings
+from core.cypher_guard import CypherGuard
+from core.usage import UsageCallback, allow_optional
 
 load_dotenv()
 
 # --- Configuration ---
 QDRANT_URL = "http://localhost:6333"
-COLLECTION_NAME = "tech_ecosystem"
+COLLECTION_NAME = "tech_ecosystem"  # Alias; ingest_vector.py switches it between built versions
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "password123"
+GRAPH_MAX_ROWS = 50  # Cap on compact rows passed into the synthesis prompt
+GRAPH_QUERY_TIMEOUT = 10  # Server-side transaction timeout (seconds) for every graph query
+RELATION_CACHE_PATH = "./cache/relation_cache.json"  # Written by ingest_graph.py
+MAX_SUPPORT_CHUNKS = 5  # Source chunks fetched by id to back a graph answer
+USER_PAGE_SIZE = 50  # Users listed per page in the persona picker
+PROFILE_HEADER = "USER PROFILE:"  # First line of a profile found by get_user_context
+LINKER_RETRY_BACKOFF = (5, 300)  # Seconds before retrying a failed entity linker load (doubles up to max)
 
 # --- 1. Vector Search Tool ---
+ALIAS_CHECK_INTERVAL = 30  # Seconds between checks of which version the alias points at
+_verified_collection = None  # Collection the alias pointed at when it was last verified
+_alias_checked_at = 0.0
+
+def resolve_collection():
+    """The collection the alias currently points at (the name itself if it isn't an alias)."""
+    response = requests.get(f"{QDRANT_URL}/aliases")
+    response.raise_for_status()
+    for alias in response.json()["result"]["aliases"]:
+        if alias["alias_name"] == COLLECTION_NAME:
+            return alias["collection_name"]
+    return COLLECTION_NAME
+
+def verify_collection(embeddings, collection: str = COLLECTION_NAME):
+    """Checks the collection was built with the same embedding model and dimension."""
+    response = requests.get(f"{QDRANT_URL}/collections/{collection}")
+    response.raise_for_status()
+    config = response.json()["result"]["config"]
+    size = config["params"]["vectors"]["size"]
+    stored = config.get("metadata") or {}
+    
+    if size != embeddings.dimension:
+        raise ValueError(
+            f"collection '{collection}' holds {size}-d vectors but "
+            f"'{embeddings.name}' produces {embeddings.dimension}-d vectors"
+        )
+    if stored.get("embedding_model") and stored["embedding_model"] != embeddings.name:
+        raise ValueError(
+            f"collection '{collection}' was built with '{stored['embedding_model']}', "
+            f"queries use '{embeddings.name}'. Re-run ingest_vector.py or set EMBEDDING_PROVIDER."
+        )
+
+def check_collection(embeddings, force: bool = False):
+    """Verifies the version behind the alias, re-resolving it at most every ALIAS_CHECK_INTERVAL.
+
+    ingest_vector.py may switch the alias to a version built with another
+    model while the app runs; each newly resolved version is verified once.
+    """
+    global _verified_collection, _alias_checked_at
+    now = time.monotonic()
+    if not force and _verified_collection is not None and now - _alias_checked_at < ALIAS_CHECK_INTERVAL:
+        return
+    collection = resolve_collection()
+    _alias_checked_at = now
+    if collection != _verified_collection:
+        verify_collection(embeddings, collection)
+        _verified_collection = collection
+
 def search_vector(query: str):
     """Searches Qdrant using direct HTTP API."""
     print(f"   [Vector] Searching for: '{query}'")
-    embeddings = OpenAIEmbeddings()
-    vector = embeddings.embed_query(query)
-    
-    search_url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/search"
-    payload = {"vector": vector, "limit": 3, "with_payload": True}
     
     try:
+        embeddings = get_embeddings()
+        check_collection(embeddings)
+        vector = embeddings.embed_query(query)
+        
+        search_url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/search"
+        payload = {"vector": vector, "limit": 3, "with_payload": True}
+        
         response = requests.post(search_url, json=payload)
+        if not response.ok:
+            # The alias may have moved since the last check: re-verify for a clear error
+            check_collection(embeddings, force=True)
         response.raise_for_status()
         data = response.json()
         results = [item.get("payload", {}).get("page_content", "") for item in data.get("result", []) if item.get("payload")]
@@ -34,98 +102,377 @@ def search_vector(query: str):
     except Exception as e:
         return f"Vector Search Error: {e}"
 
+def fetch_chunks(chunk_ids):
+    """Retrieves chunks by point id in one batched call (no embedding, no ANN search)."""
+    if not chunk_ids:
+        return []
+    print(f"   [Vector] Fetching {len(chunk_ids)} chunks by id")
+    
+    retrieve_url = f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points"
+    payload = {"ids": list(chunk_ids), "with_payload": True, "with_vector": False}
+    
+    try:
+        response = requests.post(retrieve_url, json=payload)
+        response.raise_for_status()
+        points = {item["id"]: item.get("payload") or {} for item in response.json().get("result", [])}
+        # Keep the caller's (relevance) order
+        return [points[cid] for cid in chunk_ids if cid in points]
+    except Exception as e:
+        print(f"   ❌ Chunk Fetch Error: {e}")
+        return []
+
+def format_chunks(payloads):
+    """Renders fetched chunk payloads with their source file for citation."""
+    parts = []
+    for payload in payloads:
+        source = os.path.basename((payload.get("metadata") or {}).get("source", "unknown"))
+        parts.append(f"[{source}] {payload.get('page_content', '')}")
+    return "\n\n".join(parts)
+
 # --- 2. Graph Search Tool ---
 
-CYPHER_GENERATION_TEMPLATE = """
-You are an expert Neo4j Cypher translator.
-**CRITICAL RULES:**
-1. **NEVER** use exact matching like `{{id: 'Tesla'}}`.
-2. **ALWAYS** use the `CONTAINS` clause with case-insensitive search.
-3. **RELATIONSHIPS:** **NEVER** use a colon `:` or type check inside the query.
-   - Wrong: `-[r:CEO_OF]-` 
-   - Correct: `-[r]-` (Match ANY relationship)
-4. **RETURN:** Always return the nodes AND the relationship type.
-   - Example: `RETURN p, type(r) as relationship, c`
-5. **TARGET FILTERING:** If the question implies a specific entity type (e.g. "Who" -> Person, "Company" -> Company), add that label to the target node to filter out noise.
-   - Question: "Who is the CEO of Tesla?"
-   - Correct: `MATCH (c:Company)-[r]-(p:Person) WHERE ...`
-
-Schema:
-Node properties: [id]
-Common Relationships: OWNS, CEO_OF, PARTNERED_WITH, COMPETES_WITH, ACQUIRED, SUBSIDIARY_OF
-
-Question: {question}
-Cypher Query:"""
-
-CYPHER_PROMPT = PromptTemplate(
-    input_variables=["question"], 
-    template=CYPHER_GENERATION_TEMPLATE
-)
+ENTITY_FULLTEXT_INDEX = "entity_ids"
 
-def search_graph(query: str):
-    """Searches Neo4j using a generated Cypher query."""
-    print(f"   [Graph] Generating Cypher for: '{query}'")
-    
-    try:
-        graph = Neo4jGraph(
+_graph = None
+_cypher_chains = {}
+_entity_linker = None
+_entity_linker_lock = threading.Lock()
+_linker_failures = 0
+_linker_retry_at = 0.0
+_relation_cache = None
+_relation_cache_mtime = None
+
+def get_graph():
+    """Returns the shared Neo4j connection (the driver is thread-safe)."""
+    global _graph
+    if _graph is None:
+        _graph = Neo4jGraph(
             url=NEO4J_URI, 
             username=NEO4J_USER, 
             password=NEO4J_PASSWORD,
             enhanced_schema=False, 
-            refresh_schema=False   
+            refresh_schema=False,
+            # Neo4j aborts the transaction itself, so a runaway query frees the server
+            timeout=GRAPH_QUERY_TIMEOUT
         )
-        
-        graph.schema = "Node properties: [id]"
-        
+        _graph.schema = "Node properties: [id]"
+    return _graph
+
+def get_cypher_chain(return_direct: bool):
+    """Returns the Cypher chain, built once per mode on first use.
+
+    Generated queries pass through CypherGuard (core/cypher_guard.py) before
+    they run: read-only, bounded paths, a LIMIT, and an EXPLAIN-checked plan.
+    """
+    chain = _cypher_chains.get(return_direct)
+    if chain is None:
+        # Direct mode: headroom for rows dropped by deduplication
+        top_k = GRAPH_MAX_ROWS * 2 if return_direct else GRAPH_MAX_ROWS
         chain = GraphCypherQAChain.from_llm(
-            ChatOpenAI(temperature=0, model="gpt-4o-mini"), 
-            graph=graph, 
+            # Separate clients so token usage is booked to Cypher generation vs graph QA
+            cypher_llm=ChatOpenAI(
+                temperature=0, model="gpt-4o-mini", timeout=LLM_TIMEOUT, max_retries=1,
+                callbacks=[UsageCallback("cypher")]
+            ),
+            qa_llm=ChatOpenAI(
+                temperature=0, model="gpt-4o-mini", timeout=LLM_TIMEOUT, max_retries=1,
+                callbacks=[UsageCallback("graph_qa")]
+            ),
+            graph=get_graph(), 
             verbose=True,
             allow_dangerous_requests=True,
             cypher_prompt=CYPHER_PROMPT,
-            top_k=100  # <--- Safety buffer: Fetch 100 results to catch everything
+            # return_direct=True hands back the raw records instead of asking
+            # the LLM to phrase them; ask_brain does the only synthesis call.
+            return_direct=return_direct,
+            top_k=top_k
         )
+        # from_llm builds its own corrector (validate_cypher); swap ours in afterwards
+        chain.cypher_query_corrector = CypherGuard(get_graph(), limit=top_k)
+        _cypher_chains[return_direct] = chain
+    return chain
+
+def get_entity_linker(refresh: bool = False):
+    """Builds the in-memory entity linker from the indexed entity ids once per process.
+
+    A failed load is remembered: until its backoff expires, callers get an
+    empty linker at once instead of each retrying the connection.
+    """
+    global _entity_linker, _linker_failures, _linker_retry_at
+    if _entity_linker is not None and not refresh:
+        return _entity_linker
+    with _entity_linker_lock:
+        if _entity_linker is not None and not refresh:
+            return _entity_linker  # Loaded by another thread while we waited
+        if time.monotonic() < _linker_retry_at:
+            return EntityLinker()
+        try:
+            data = get_graph().query(
+                "MATCH (n:__Entity__) RETURN n.id AS id, coalesce(n.aliases, []) AS aliases"
+            )
+        except Exception as e:
+            first, cap = LINKER_RETRY_BACKOFF
+            backoff = min(cap, first * 2 ** _linker_failures)
+            _linker_failures += 1
+            _linker_retry_at = time.monotonic() + backoff
+            print(f"   ⚠️ Entity linker unavailable (retrying in {backoff}s): {e}")
+            return _entity_linker or EntityLinker()
+        aliases = {alias: row["id"] for row in data for alias in row["aliases"]}
+        _entity_linker = EntityLinker([row["id"] for row in data], aliases)
+        _linker_failures = 0
+        print(f"   [Graph] Entity linker ready ({len(_entity_linker)} aliases)")
+    return _entity_linker
+
+def get_relation_cache():
+    """Returns the 2-hop relation cache, reloading it when ingestion rewrites the snapshot."""
+    global _relation_cache, _relation_cache_mtime
+    try:
+        mtime = os.path.getmtime(RELATION_CACHE_PATH)
+    except OSError:
+        mtime = None
+
+    if mtime is not None and mtime != _relation_cache_mtime:
+        _relation_cache = RelationCache.load(RELATION_CACHE_PATH)
+        _relation_cache_mtime = mtime
+    elif _relation_cache is None:
+        # No snapshot yet: materialize from the live graph and persist it
+        try:
+            _relation_cache = RelationCache.from_graph(get_graph())
+            _relation_cache.save(RELATION_CACHE_PATH)
+            _relation_cache_mtime = os.path.getmtime(RELATION_CACHE_PATH)
+        except Exception as e:
+            print(f"   ⚠️ Relation cache unavailable: {e}")
+            return RelationCache()
+    return _relation_cache
+
+def link_entities(query: str):
+    """Finds the anchor entity ids mentioned in the question."""
+    return get_entity_linker().find(query)
+
+def link_mentions(query: str):
+    """Like link_entities, but returns (start, stop, entity_id) spans over the normalized question."""
+    return get_entity_linker().mentions(query)
+
+def _format_anchors(anchors):
+    return ", ".join(f"'{a}'" for a in anchors) if anchors else "(none)"
+
+def search_graph(query: str):
+    """Searches Neo4j using a generated Cypher query."""
+    print(f"   [Graph] Generating Cypher for: '{query}'")
+    if not allow_optional("cypher"):
+        return "Graph Error: token budget exhausted"
+    
+    try:
+        chain = get_cypher_chain(return_direct=False)
         
-        response = chain.invoke({"query": query})
+        anchors = link_entities(query)
+        response = chain.invoke({"query": query, "anchors": _format_anchors(anchors)})
         return response['result']
         
     except Exception as e:
         return f"Graph Error: {e}"
 
+def _compact_value(value):
+    """Reduces a Neo4j value (node dict, relationship tuple, list) to plain text."""
+    if isinstance(value, dict):
+        return str(value.get("id") or value.get("name") or value)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_compact_value(v) for v in value)
+    return str(value)
+
+def compact_graph_rows(records, max_rows: int = GRAPH_MAX_ROWS):
+    """Turns raw Cypher records into deduplicated (subject, relation, object) rows.
+
+    Returns (rows, chunk_ids): the ids of the source chunks behind those rows,
+    relationship provenance first, then the nodes'.
+    """
+    rows = []
+    seen = set()
+    rel_chunks, node_chunks = [], []
+    for record in records:
+        if isinstance(record, dict):
+            rel_chunks.extend(record.pop("sources", None) or [])
+            values = list(record.values())
+        else:
+            values = [record]
+        # A returned relationship comes back as (start_node, type, end_node)
+        if len(values) == 1 and isinstance(values[0], tuple) and len(values[0]) == 3:
+            values = list(values[0])
+        for v in values:
+            if isinstance(v, dict):
+                node_chunks.extend(v.pop("source_chunks", None) or [])
+        row = tuple(_compact_value(v) for v in values if v is not None)
+        if not row or row in seen:
+            continue
+        seen.add(row)
+        rows.append(row)
+        if len(rows) >= max_rows:
+            break
+    chunk_ids = list(dict.fromkeys(rel_chunks + node_chunks))
+    return rows, chunk_ids
+
+def format_graph_rows(rows):
+    """Renders compact rows as one fact per line for the synthesis prompt."""
+    lines = []
+    for row in rows:
+        if len(row) == 3:
+            lines.append(f"{row[0]} -[{row[1]}]- {row[2]}")
+        else:
+            lines.append(" | ".join(row))
+    return "\n".join(lines)
+
+def search_graph_rows(query: str, use_cache: bool = True):
+    """Runs the generated Cypher and returns (compact rows, source chunk ids), skipping the QA LLM call."""
+    try:
+        anchors = link_entities(query)
+        print(f"   [Graph] Anchors: {anchors}")
+        
+        # Common multi-hop shapes are a single in-memory lookup
+        if use_cache and anchors:
+            rows = get_relation_cache().answer(query, anchors)
+            if rows:
+                print(f"   [Graph] Relation cache hit ({len(rows)} rows)")
+                rows = rows[:GRAPH_MAX_ROWS]
+                return rows, get_relation_chunk_ids(rows)
+        
+        if not allow_optional("cypher"):
+            # Out of budget: the anchors' neighbourhood is an indexed seek, no LLM call
+            return get_entity_neighbourhood(anchors) if anchors else ([], [])
+        
+        print(f"   [Graph] Generating Cypher (direct rows) for: '{query}'")
+        chain = get_cypher_chain(return_direct=True)
+        
+        response = chain.invoke({"query": query, "anchors": _format_anchors(anchors)})
+        return compact_graph_rows(response['result'])
+        
+    except Exception as e:
+        print(f"   ❌ Graph Error: {e}")
+        return [], []
+
+def get_entity_neighbourhood(entity_ids, limit: int = GRAPH_MAX_ROWS):
+    """Fetches the relationships around known entities by indexed seek (no LLM call).
+
+    Returns (rows, chunk_ids) like search_graph_rows.
+    """
+    if not entity_ids:
+        return [], []
+    print(f"   [Graph] Fetching neighbourhood of: {list(entity_ids)}")
+    try:
+        data = get_graph().query(
+            """
+            UNWIND $ids AS id
+            MATCH (a:__Entity__ {id: id})
+            CALL {
+                WITH a
+                MATCH (a)-[r]-(b)
+                RETURN r LIMIT $limit
+            }
+            RETURN startNode(r).id AS source, type(r) AS relationship,
+                   endNode(r).id AS target, r.source_chunks AS sources
+            """,
+            {"ids": list(entity_ids), "limit": limit},
+        )
+    except Exception as e:
+        print(f"   ❌ Graph Error: {e}")
+        return [], []
+    return compact_graph_rows(data, max_rows=limit * len(entity_ids))
+
+def get_entity_chunk_ids(entity_ids):
+    """Looks up the source chunk ids recorded on entity nodes (one indexed query)."""
+    if not entity_ids:
+        return []
+    try:
+        data = get_graph().query(
+            """
+            UNWIND $ids AS id
+            MATCH (n:__Entity__ {id: id})
+            RETURN coalesce(n.source_chunks, []) AS chunks
+            """,
+            {"ids": list(entity_ids)},
+        )
+    except Exception as e:
+        print(f"   ❌ Graph Error: {e}")
+        return []
+    return list(dict.fromkeys(c for row in data for c in row["chunks"]))
+
+def get_relation_chunk_ids(rows):
+    """Source chunk ids behind cached (subject, hop, object) rows, edges first, then entities.
+
+    The cache stores derived hops, not relationships, so the stored edges between
+    each pair are looked up again (indexed seeks on both ends).
+    """
+    pairs = [{"a": row[0], "b": row[2]} for row in rows if len(row) == 3]
+    if not pairs:
+        return []
+    try:
+        data = get_graph().query(
+            """
+            UNWIND $pairs AS pair
+            MATCH (a:__Entity__ {id: pair.a})-[r]-(b:__Entity__ {id: pair.b})
+            WHERE type(r) IN $types
+            RETURN coalesce(r.source_chunks, []) AS chunks
+            """,
+            {"pairs": pairs, "types": list(CHAIN_TYPES)},
+        )
+    except Exception as e:
+        print(f"   ❌ Graph Error: {e}")
+        data = []
+    rel_chunks = [c for row in data for c in row["chunks"]]
+    entities = list(dict.fromkeys(e for pair in pairs for e in (pair["a"], pair["b"])))
+    return list(dict.fromkeys(rel_chunks + get_entity_chunk_ids(entities)))
+
+def list_users(after: str = "", limit: int = USER_PAGE_SIZE, prefix: str = ""):
+    """Returns up to `limit` user ids sorted by id, starting after `after` (keyset pagination).
+
+    Each page is a range seek on the User.id constraint index, so the cost
+    does not grow with the page number the way SKIP would. Returns None when
+    Neo4j can't be queried, so callers can tell "unreachable" from "no users".
+    """
+    try:
+        data = get_graph().query(
+            """
+            MATCH (u:User)
+            WHERE u.id > $after AND u.id STARTS WITH $prefix
+            RETURN u.id AS id
+            ORDER BY u.id
+            LIMIT $limit
+            """,
+            {"after": after or "", "prefix": prefix or "", "limit": limit},
+        )
+    except Exception as e:
+        print(f"   ❌ User listing error: {e}")
+        return None
+    return [row["id"] for row in data]
+
 def get_user_context(user_id: str):
     """Fetches the user's role and preferences from the Graph."""
     print(f"   [Memory] Looking up profile for: {user_id}")
     
     try:
-        graph = Neo4jGraph(
-            url=NEO4J_URI, 
-            username=NEO4J_USER, 
-            password=NEO4J_PASSWORD,
-            enhanced_schema=False,
-            refresh_schema=False
-        )
+        graph = get_graph()
         
-        # Query to get user details
-        query = f"""
-        MATCH (u:User {{id: '{user_id}'}})-[:PREFERS]->(p)
+        # Indexed seek on the User.id constraint; users without preferences still match
+        query = """
+        MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (u)-[:PREFERS]->(p:Preference)
         RETURN u.role as role, u.style as style, collect(p.name) as prefs
         """
         
-        data = graph.query(query)
+        data = graph.query(query, {"user_id": user_id})
         
         if not data:
             return "User not found. Defaulting to neutral tone."
             
         user = data[0]
         context_str = (
-            f"USER PROFILE:\n"
+            f"{PROFILE_HEADER}\n"
             f"- Name: {user_id}\n"
             f"- Role: {user['role']}\n"
             f"- Preferred Style: {user['style']}\n"
-            f"- Key Interests: {', '.join(user['prefs'])}\n"
+            f"- Key Interests: {', '.join(user['prefs']) or 'None listed'}\n"
             f"INSTRUCTION: Tailor the answer specifically for a {user['role']}."
         )
         return context_str
         
     except Exception as e:
-        return f"Memory Error: {e}"
\ No newline at end of file
+        return f"Memory Error: {e}"
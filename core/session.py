@@ -0,0 +1,121 @@
+import re
+from collections import OrderedDict
+
+MAX_ENTITIES = 8              # Entities remembered per conversation (LRU)
+MAX_FACTS_PER_ENTITY = 60     # Context lines kept per entity
+
+# Follow-up pronouns -> replacement template for the last entity discussed
+PRONOUNS = {
+    "its": "{}'s", "their": "{}'s", "his": "{}'s", "her": "{}'s",
+    "it": "{}", "they": "{}", "them": "{}", "he": "{}", "she": "{}", "him": "{}",
+}
+PRONOUN_RE = re.compile(r"\b(" + "|".join(PRONOUNS) + r")\b", re.IGNORECASE)
+# A pronoun after one of these usually points back into the same question
+# ("What is generative AI and how does it work?"), not at an earlier turn
+CLAUSE_RE = re.compile(r"[,;]|\b(?:and|but|or|then)\b", re.IGNORECASE)
+LEADING_CONNECTIVE_RE = re.compile(r"^\s*(?:and|but|so|also|then|what about|how about)\b[\s,]*", re.IGNORECASE)
+# Impersonal "it" with an extraposed subject refers to nothing earlier:
+# "What does it mean to be a unicorn?", "How long does it take to build a fab?",
+# "Is it possible to ...?". A bare "What does it cost?" is still a follow-up.
+IMPERSONAL_IT_RE = re.compile(
+    r"\bit\s+(?:means?|meant|takes?|took|costs?|matters?|seems?|feels?)\b(?=.*\b(?:to|for|that)\b)"
+    r"|\bit\s+(?:is|was|'s)\s+\w+\s+(?:to|that)\b"
+    r"|\b(?:is|was)\s+it\s+\w+\s+(?:to|that)\b",
+    re.IGNORECASE,
+)
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for",
+    "from", "has", "have", "how", "in", "is", "it", "its", "me", "of", "on", "or",
+    "s", "tell", "that", "the", "their", "this", "to", "was", "what", "when",
+    "where", "which", "who", "whom", "why", "with", "about", "also", "now",
+}
+
+
+def is_follow_up(question: str) -> bool:
+    """True when a pronoun appears in the question's first clause, before any antecedent it could have."""
+    text = LEADING_CONNECTIVE_RE.sub("", question)
+    first_clause = CLAUSE_RE.split(text, maxsplit=1)[0]
+    return bool(PRONOUN_RE.search(IMPERSONAL_IT_RE.sub(" ", first_clause)))
+
+
+def terms(text: str):
+    """Content words of a text, lowercased and crudely singularized."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words if w not in STOPWORDS}
+
+
+class ConversationSession:
+    """State shared across the turns of one chat: persona, entities and retrieved context.
+
+    Context lines are kept per entity and bounded, so a follow-up about an
+    entity already discussed can be answered from what was fetched before.
+    """
+
+    def __init__(self, user_id: str, max_entities: int = MAX_ENTITIES):
+        self.user_id = user_id
+        self.persona = None
+        self.max_entities = max_entities
+        self._facts = OrderedDict()  # entity id -> [context lines], most recent last
+        self.stats = {"turns": 0, "reused": 0, "fetched": 0, "tokens": 0}
+
+    @property
+    def last_entity(self):
+        return next(reversed(self._facts), None)
+
+    def follow_up_entity(self, question: str, linked):
+        """The earlier entity a follow-up refers to, or None if the question stands on its own."""
+        last = self.last_entity
+        if linked or last is None or not is_follow_up(question):
+            return None
+        return last
+
+    @staticmethod
+    def resolve(question: str, entity: str):
+        """Rewrites the question's pronouns to `entity`, for routing and retrieval only."""
+        return PRONOUN_RE.sub(lambda m: PRONOUNS[m.group(1).lower()].format(entity), question)
+
+    def touch(self, entities):
+        """Marks entities as the most recently discussed, evicting the oldest."""
+        for entity in entities:
+            self._facts.setdefault(entity, [])
+            self._facts.move_to_end(entity)
+        while len(self._facts) > self.max_entities:
+            self._facts.popitem(last=False)
+
+    def missing(self, entities):
+        """Entities with no cached context yet."""
+        return [e for e in entities if not self._facts.get(e)]
+
+    def remember(self, entities, lines):
+        """Caches retrieved context lines under each entity they were fetched for."""
+        self.touch(entities)
+        for entity in entities:
+            facts = self._facts[entity]
+            for line in lines:
+                if line and line not in facts:
+                    facts.append(line)
+            del facts[:-MAX_FACTS_PER_ENTITY]
+
+    def covered(self, question: str, entities):
+        """Returns the cached lines answering the question, or None if something is missing.
+
+        Covered means every content word of the question (other than the
+        entity names) appears in some line an earlier turn retrieved about
+        those entities. Entities with nothing cached don't count towards it.
+        """
+        known = [e for e in entities if self._facts.get(e)]
+        if not known:
+            return None
+        wanted = terms(question) - set().union(*(terms(e) for e in entities))
+        if not wanted:
+            return None
+
+        relevant, found = [], set()
+        for entity in known:
+            for line in self._facts[entity]:
+                hit = wanted & terms(line)
+                if hit and line not in relevant:
+                    relevant.append(line)
+                    found |= hit
+        return relevant if found == wanted else None
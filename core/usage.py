@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+
+# --- Configuration ---
+# Tokens one question may spend across all its model calls; 0 disables the budget
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "8000"))
+MAX_LEDGER_CALLS = 100_000  # Oldest call records are dropped beyond this
+OPTIONAL_CALL_TOKENS = 800  # Rough cost of one routing, planning or Cypher call
+SYNTHESIS_RESERVE = 1500    # Tokens held back so the answer can always be written
+MIN_CONTEXT_TOKENS = 300    # Retrieved context is never trimmed below this
+
+# USD per 1M tokens: (input, cached input, output)
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "text-embedding-ada-002": (0.10, 0.10, 0.0),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting before a call."""
+    return (len(text) + 3) // 4
+
+
+def price(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Cost in USD; dated model names ("gpt-4o-mini-2024-07-18") use their base price."""
+    base = max((m for m in PRICES if model.startswith(m)), key=len, default=None)
+    if base is None:
+        return 0.0
+    prompt_rate, cached_rate, completion_rate = PRICES[base]
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * prompt_rate + cached_tokens * cached_rate + completion_tokens * completion_rate) / 1e6
+
+
+class RequestUsage:
+    """Token usage of one question, shared by every stage thread it spawns."""
+
+    def __init__(self, persona: str = None, budget: int = REQUEST_TOKEN_BUDGET):
+        self.id = uuid.uuid4().hex[:8]
+        self.persona = persona
+        self.budget = budget
+        self.tokens = 0
+        self.cost = 0.0
+        self.skipped = []  # Optional steps dropped to stay within budget
+        self._reserved = {}  # stage -> tokens held for allowed calls whose usage isn't recorded yet
+        self._lock = threading.Lock()
+
+    def add(self, tokens: int, cost: float, stage: str = None):
+        """Books one call; it settles one reservation its stage holds, if any."""
+        with self._lock:
+            self.tokens += tokens
+            self.cost += cost
+            held = self._reserved.get(stage)
+            if held:
+                held.pop()
+                if not held:
+                    del self._reserved[stage]
+
+    def _remaining(self):
+        return max(0, self.budget - self.tokens - sum(sum(h) for h in self._reserved.values()))
+
+    def remaining(self):
+        """Tokens left after spending and reservations, or None when the budget is disabled."""
+        if not self.budget:
+            return None
+        with self._lock:
+            return self._remaining()
+
+    def reserve(self, stage: str, needed: int, amount: int):
+        """Holds `amount` tokens for a call if `needed` still fit; returns (reserved?, tokens left).
+
+        Check and hold happen under one lock, so concurrent sub-queries can't
+        all pass on the same remaining budget.
+        """
+        with self._lock:
+            remaining = self._remaining()
+            if remaining < needed:
+                return False, remaining
+            if amount:
+                self._reserved.setdefault(stage, []).append(amount)
+            return True, remaining
+
+
+_request = contextvars.ContextVar("usage_request", default=None)
+_ledger = deque(maxlen=MAX_LEDGER_CALLS)
+_ledger_lock = threading.Lock()
+
+
+def current_request():
+    return _request.get()
+
+
+@contextmanager
+def track_request(persona: str = None, budget: int = REQUEST_TOKEN_BUDGET):
+    """Attributes model calls made inside the block (and its copied contexts) to one request."""
+    usage = RequestUsage(persona, budget)
+    token = _request.set(usage)
+    try:
+        yield usage
+    finally:
+        _request.reset(token)
+
+
+def can_spend(tokens: int, stage: str = None, reserve: int = 0) -> bool:
+    """True if the current request can still afford about `tokens`; records the skip if not.
+
+    With `reserve`, that many tokens are held for the call until its usage is
+    recorded under the same stage (see record_usage). A call that never
+    reports usage (cache hit, error) keeps its hold until the request ends,
+    which can only make the budget stricter.
+    """
+    usage = current_request()
+    if usage is None or not usage.budget:
+        return True
+    allowed, remaining = usage.reserve(stage, tokens, reserve)
+    if allowed:
+        return True
+    if stage:
+        usage.skipped.append(stage)
+        print(f"   💸 Token budget: skipping {stage} ({remaining} of {usage.budget} left)")
+    return False
+
+
+def allow_optional(stage: str) -> bool:
+    """Whether an optional model call still fits, leaving the synthesis reserve untouched.
+
+    `stage` must match the UsageCallback stage of the call it guards, so the
+    call's reservation is settled when its usage arrives.
+    """
+    return can_spend(OPTIONAL_CALL_TOKENS + SYNTHESIS_RESERVE, stage, reserve=OPTIONAL_CALL_TOKENS)
+
+
+def trim_to_budget(text: str, overhead: str = "") -> str:
+    """Drops trailing context lines so the synthesis prompt fits what is left of the budget.
+
+    `overhead` is the rest of the prompt (profile, question); the answer's
+    share is kept back from the remainder.
+    """
+    usage = current_request()
+    remaining = usage.remaining() if usage is not None else None
+    if remaining is None:
+        return text
+    limit = max(MIN_CONTEXT_TOKENS, remaining - estimate_tokens(overhead) - SYNTHESIS_RESERVE // 2)
+    if estimate_tokens(text) <= limit:
+        return text
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > limit:
+            break
+        kept.append(line)
+        used += cost
+    usage.skipped.append("context")
+    print(f"   💸 Token budget: context trimmed to {len(kept)} lines (~{used} tokens)")
+    return "\n".join(kept)
+
+
+def record_usage(stage: str, model: str, prompt_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0):
+    """Adds one model call to the ledger and to the current request's total."""
+    usage = current_request()
+    cost = price(model, prompt_tokens, completion_tokens, cached_tokens)
+    with _ledger_lock:
+        _ledger.append({
+            "timestamp": time.time(),
+            "request_id": usage.id if usage else None,
+            "persona": usage.persona if usage else None,
+            "stage": stage,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cost_usd": cost,
+        })
+    if usage is not None:
+        usage.add(prompt_tokens + completion_tokens, cost, stage)
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Records the token usage OpenAI reports for every call of the model it is attached to.
+
+    Pass one per call site, e.g. `ChatOpenAI(..., callbacks=[UsageCallback("route")])`.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def on_llm_end(self, response, **kwargs):
+        output = response.llm_output or {}
+        token_usage = output.get("token_usage") or {}
+        if not token_usage:
+            return
+        cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        record_usage(
+            self.stage,
+            output.get("model_name", "unknown"),
+            token_usage.get("prompt_tokens", 0),
+            token_usage.get("completion_tokens", 0),
+            cached,
+        )
+
+
+def usage_frame():
+    """All recorded calls as a DataFrame (one row per model call)."""
+    with _ledger_lock:
+        return pd.DataFrame(list(_ledger), columns=[
+            "timestamp", "request_id", "persona", "stage", "model", "prompt_tokens",
+            "cached_tokens", "completion_tokens", "total_tokens", "cost_usd",
+        ])
+
+
+def usage_summary(df=None):
+    """Totals per request, per stage and per persona, stacked into one table."""
+    df = usage_frame() if df is None else df
+    columns = ["prompt_tokens", "cached_tokens", "completion_tokens", "total_tokens", "cost_usd"]
+    tables = []
+    for group in ["request_id", "stage", "persona"]:
+        totals = df.fillna({group: "-"}).groupby(group)[columns].sum()
+        totals.insert(0, "calls", df.fillna({group: "-"}).groupby(group).size())
+        tables.append(totals.reset_index().rename(columns={group: "key"}).assign(group=group))
+    summary = pd.concat(tables, ignore_index=True)
+    return summary[["group", "key", "calls"] + columns]
+
+
+def export_usage(name: str):
+    """Writes '<name>_usage.csv' (totals) and '<name>_usage_calls.csv' (every call)."""
+    df = usage_frame()
+    usage_summary(df).to_csv(f"{name}_usage.csv", index=False)
+    df.to_csv(f"{name}_usage_calls.csv", index=False)
+    print(f"💰 {len(df)} model calls, {df['total_tokens'].sum():,} tokens, ${df['cost_usd'].sum():.4f} "
+          f"-> '{name}_usage.csv'")
@@ -1,6 +1,10 @@
-import wikipedia
 import os
+import json
 import time
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 topics = [
     "Apple Inc.",
@@ -43,23 +47,143 @@ topics = [
     "YouTube"
 ]
 
-output_dir = "./data"
-os.makedirs(output_dir, exist_ok=True)
+# Configuration
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")  # Point at a stub server for tests
+OUTPUT_DIR = "./data"
+REVISIONS_FILE = ".revisions.json"          # topic -> last downloaded revision id
+CHANGED_FILES_FILE = "changed_files.json"  # Files refreshed so far; read by the ingestion scripts (--changed-only)
+MAX_WORKERS = 8             # Concurrent page fetches
+REQUESTS_PER_SECOND = 5     # Global limit shared by all workers (be polite to Wikipedia)
+TITLES_PER_QUERY = 50       # MediaWiki's cap for batched title lookups
+USER_AGENT = "AgenticHybridRAG/1.0 (corpus refresher)"
 
-print(f"Downloading data for {len(topics)} Wikipedia pages...")
+class RateLimiter:
+    """Spaces requests evenly across all threads."""
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
 
-for topic in topics:
-    try:
-        page = wikipedia.page(topic, auto_suggest=False)
-        filename =  topic.replace(" ", "_").replace(",", "").replace("/", "") + ".txt"
-        filepath = os.path.join(output_dir, filename)
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(page.content)
-        print(f"Saved {filename}")
+def topic_filename(topic):
+    return topic.replace(" ", "_").replace(",", "").replace("/", "") + ".txt"
 
-        time.sleep(1)
-    except Exception as e:
-        print(f"Error downloading {topic}: {e}")
+def write_atomic(path, text):
+    """Writes via a temp file + rename, so readers never see a half-written file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
-print("All data downloaded successfully!")
\ No newline at end of file
+def api_query(session, limiter, api_url, **params):
+    limiter.wait()
+    params.update({"action": "query", "format": "json", "formatversion": 2, "redirects": 1})
+    response = session.get(api_url, params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()["query"]
+
+def resolve_titles(query, titles):
+    """Maps each requested title to the page title after normalization/redirects."""
+    hops = {h["from"]: h["to"] for h in query.get("normalized", []) + query.get("redirects", [])}
+    resolved = {}
+    for title in titles:
+        current = title
+        while current in hops:
+            current = hops[current]
+        resolved[title] = current
+    return resolved
+
+def fetch_revisions(session, limiter, api_url, titles):
+    """Cheap batched check: current revision id of every topic."""
+    revisions = {}
+    for i in range(0, len(titles), TITLES_PER_QUERY):
+        batch = titles[i:i + TITLES_PER_QUERY]
+        query = api_query(session, limiter, api_url, prop="revisions", rvprop="ids", titles="|".join(batch))
+        by_title = {p["title"]: p["revisions"][0]["revid"] for p in query.get("pages", []) if p.get("revisions")}
+        for topic, title in resolve_titles(query, batch).items():
+            if title in by_title:
+                revisions[topic] = by_title[title]
+    return revisions
+
+def fetch_page(session, limiter, api_url, topic):
+    """Downloads the plain-text content and revision id of one topic."""
+    query = api_query(
+        session, limiter, api_url,
+        prop="extracts|revisions", explaintext=1, rvprop="ids", titles=topic,
+    )
+    page = query["pages"][0]
+    if page.get("missing") or "extract" not in page:
+        raise ValueError(f"page '{topic}' not found")
+    return page["extract"], page["revisions"][0]["revid"]
+
+def refresh_corpus(topics, output_dir=OUTPUT_DIR, api_url=WIKI_API_URL, max_workers=MAX_WORKERS,
+                   per_second=REQUESTS_PER_SECOND, force=False):
+    """Downloads only topics whose revision changed; returns the list of files written."""
+    os.makedirs(output_dir, exist_ok=True)
+    revisions_path = os.path.join(output_dir, REVISIONS_FILE)
+    known = {}
+    if os.path.exists(revisions_path):
+        with open(revisions_path, encoding="utf-8") as f:
+            known = json.load(f)
+
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    limiter = RateLimiter(per_second)
+
+    print(f"🔎 Checking revisions for {len(topics)} Wikipedia pages...")
+    live = fetch_revisions(session, limiter, api_url, topics)
+    missing = [t for t in topics if t not in live]
+    for topic in missing:
+        print(f"Error downloading {topic}: page not found")
+    stale = [
+        t for t in topics
+        if t in live and (
+            force or live[t] != known.get(t)
+            or not os.path.exists(os.path.join(output_dir, topic_filename(t)))
+        )
+    ]
+    print(f"   - {len(live) - len(stale)} unchanged, {len(stale)} to download")
+
+    changed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_page, session, limiter, api_url, t): t for t in stale}
+        for future in as_completed(futures):
+            topic = futures[future]
+            try:
+                content, revid = future.result()
+            except Exception as e:
+                print(f"Error downloading {topic}: {e}")
+                continue
+            filepath = os.path.join(output_dir, topic_filename(topic))
+            write_atomic(filepath, content)
+            known[topic] = revid
+            changed.append(filepath)
+            print(f"Saved {topic_filename(topic)}")
+
+    write_atomic(revisions_path, json.dumps(known, indent=2, sort_keys=True))
+    # Add to the list instead of replacing it: two refreshes before one ingest must
+    # not lose the first one's files. Each ingester skips what it already indexed.
+    changed_path = os.path.join(output_dir, CHANGED_FILES_FILE)
+    pending = []
+    if os.path.exists(changed_path):
+        with open(changed_path, encoding="utf-8") as f:
+            pending = json.load(f)
+    write_atomic(changed_path, json.dumps(sorted(set(pending) | set(changed)), indent=2))
+    return sorted(changed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the Wikipedia corpus in ./data")
+    parser.add_argument("--api-url", default=WIKI_API_URL)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Re-download every topic")
+    args = parser.parse_args()
+
+    changed = refresh_corpus(topics, args.output_dir, args.api_url, args.workers, force=args.force)
+    print(f"✅ Corpus refreshed: {len(changed)} files changed (added to {CHANGED_FILES_FILE}).")
@@ -1,13 +1,14 @@
 import os
-import glob
-import time
+import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import ChatOpenAI
 from langchain_experimental.graph_transformers import LLMGraphTransformer
 from langchain_community.graphs import Neo4jGraph
 from dotenv import load_dotenv
+from core.retriever import ENTITY_FULLTEXT_INDEX, RELATION_CACHE_PATH
+from core.relation_cache import RelationCache, CHAIN_TYPES
+from core.chunk_store import build_chunk_store, open_chunk_store, chunk_documents, read_changed_files, mark_ingested
+from core.usage import UsageCallback, export_usage
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -22,9 +23,10 @@ MODEL_NAME = "gpt-4o-mini"
 # 🛑 SAFETY LIMIT: Set to None to process EVERYTHING.
 CHUNK_LIMIT = None 
 MAX_WORKERS = 5  # Number of parallel requests (Don't go too high or you hit Rate Limits)
+MAX_SOURCE_CHUNKS = 20  # Provenance cap per node/relationship (hub entities appear everywhere)
 
 def process_batch(transformer, batch, batch_index):
-    """Helper function to process a single batch of text."""
+    """Helper function to process a single batch of text; None if extraction failed."""
     try:
         print(f"   ⏳ Starting batch {batch_index}...")
         graph_documents = transformer.convert_to_graph_documents(batch)
@@ -32,10 +34,139 @@ def process_batch(transformer, batch, batch_index):
         return graph_documents
     except Exception as e:
         print(f"   ❌ Error in batch {batch_index}: {e}")
-        return []
+        return None
 
-def ingest_graph():
-    if not os.getenv("OPENAI_API_KEY"):
+# Baseline graphs were written with apoc.merge.node([type], {id}), so one id can sit
+# on several nodes with different labels; fold them into one before the unique constraint
+MERGE_DUPLICATE_IDS_QUERY = """
+MATCH (n:__Entity__)
+WITH n.id AS id, collect(n) AS nodes
+WHERE size(nodes) > 1
+CALL apoc.refactor.mergeNodes(nodes, {properties: 'combine', mergeRels: true}) YIELD node
+RETURN count(node) AS merged
+"""
+
+def ensure_entity_indexes(graph):
+    """Labels entity nodes and builds the id indexes graph retrieval seeks on.
+
+    Raises RuntimeError if any index is missing afterwards: without them every
+    batch write and every anchor seek would fail or scan.
+    """
+    print("🗂️ Ensuring entity indexes...")
+    steps = [
+        # Older graphs were written without baseEntityLabel; tag their entity nodes once
+        ("Label entity nodes", """
+        MATCH (n) WHERE n.id IS NOT NULL AND NOT n:__Entity__ AND NOT n:User AND NOT n:Preference
+        SET n:__Entity__
+        """),
+        ("Merge duplicate entity ids", MERGE_DUPLICATE_IDS_QUERY),
+        # Unique id -> range index used for exact anchor seeks
+        ("Unique entity id constraint",
+         "CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (n:__Entity__) REQUIRE n.id IS UNIQUE"),
+        # Fulltext index for fuzzy lookups when no anchor was linked (doesn't need the constraint)
+        ("Fulltext entity index",
+         f"CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS FOR (n:__Entity__) ON EACH [n.id]"),
+    ]
+    failed = []
+    for name, query in steps:
+        try:
+            result = graph.query(query)
+            merged = result[0].get("merged") if result else None
+            print(f"   ✅ {name}" + (f" ({merged} duplicate ids merged)" if merged else ""))
+        except Exception as e:
+            print(f"   ❌ {name} failed: {e}")
+            failed.append(name)
+    if failed:
+        raise RuntimeError(f"entity index setup failed: {', '.join(failed)}")
+
+def load_relation_cache(graph, rebuild: bool = False):
+    """Loads the relation cache snapshot, or rebuilds it from the graph.
+
+    The snapshot only ever grows between rebuilds, so it is rebuilt whenever the
+    graph may have lost edges (a full ingest, or --rebuild-cache after a cleanup).
+    """
+    if os.path.exists(RELATION_CACHE_PATH) and not rebuild:
+        return RelationCache.load(RELATION_CACHE_PATH)
+    print("🔗 Rebuilding relation cache from the graph...")
+    relation_cache = RelationCache.from_graph(graph)
+    relation_cache.save(RELATION_CACHE_PATH)
+    print(f"   - {len(relation_cache)} chains materialized")
+    return relation_cache
+
+def chain_edges(graph_docs):
+    """Extracts the (source, type, target) edges the relation cache materializes."""
+    return [
+        (rel.source.id, rel.type, rel.target.id)
+        for doc in graph_docs
+        for rel in doc.relationships
+        if rel.type in CHAIN_TYPES
+    ]
+
+def provenance_rows(graph_docs):
+    """Groups source chunk ids by node id and by (source, type, target) relationship."""
+    nodes, rels = {}, {}
+    for doc in graph_docs:
+        chunk = doc.source.metadata.get("chunk_id")
+        if not chunk:
+            continue
+        for node in doc.nodes:
+            nodes.setdefault(node.id, set()).add(chunk)
+        for rel in doc.relationships:
+            rels.setdefault((rel.source.id, rel.type, rel.target.id), set()).add(chunk)
+    node_rows = [{"id": k, "chunks": sorted(v)} for k, v in nodes.items()]
+    rel_rows = [
+        {"source": s, "type": t, "target": o, "chunks": sorted(v)}
+        for (s, t, o), v in rels.items()
+    ]
+    return node_rows, rel_rows
+
+def write_provenance(graph, graph_docs):
+    """Records which chunk (Qdrant point id) each node and relationship came from.
+
+    New ids go first and the oldest fall off past the cap, so hub entities keep
+    collecting provenance from fresh extractions.
+    """
+    node_rows, rel_rows = provenance_rows(graph_docs)
+    graph.query("""
+    UNWIND $rows AS row
+    MATCH (n:__Entity__ {id: row.id})
+    WITH n, row, coalesce(n.source_chunks, []) AS existing
+    SET n.source_chunks = (row.chunks + [c IN existing WHERE NOT c IN row.chunks])[..$cap]
+    """, {"rows": node_rows, "cap": MAX_SOURCE_CHUNKS})
+    graph.query("""
+    UNWIND $rows AS row
+    MATCH (a:__Entity__ {id: row.source})-[r]->(b:__Entity__ {id: row.target})
+    WHERE type(r) = row.type
+    WITH r, row, coalesce(r.source_chunks, []) AS existing
+    SET r.source_chunks = (row.chunks + [c IN existing WHERE NOT c IN row.chunks])[..$cap]
+    """, {"rows": rel_rows, "cap": MAX_SOURCE_CHUNKS})
+
+def prune_provenance(graph, live_ids):
+    """Drops chunk ids that are no longer in the chunk store (and so no longer in Qdrant).
+
+    A refreshed file gets new chunk ids; without this its old ones would stay
+    on nodes and relationships and cite chunks that were deleted.
+    """
+    live = list(live_ids)
+    nodes = graph.query("""
+    MATCH (n:__Entity__) WHERE n.source_chunks IS NOT NULL
+    WITH n, [c IN n.source_chunks WHERE c IN $live] AS kept
+    WHERE size(kept) < size(n.source_chunks)
+    SET n.source_chunks = kept
+    RETURN count(n) AS pruned
+    """, {"live": live})[0]["pruned"]
+    rels = graph.query("""
+    MATCH ()-[r]->() WHERE r.source_chunks IS NOT NULL
+    WITH r, [c IN r.source_chunks WHERE c IN $live] AS kept
+    WHERE size(kept) < size(r.source_chunks)
+    SET r.source_chunks = kept
+    RETURN count(r) AS pruned
+    """, {"live": live})[0]["pruned"]
+    if nodes or rels:
+        print(f"   - Pruned stale provenance from {nodes} nodes and {rels} relationships")
+
+def ingest_graph(changed_only: bool = False, rebuild_cache_only: bool = False):
+    if not rebuild_cache_only and not os.getenv("OPENAI_API_KEY"):
         print("❌ Error: OPENAI_API_KEY not found.")
         return
 
@@ -46,30 +177,42 @@ def ingest_graph():
         print(f"❌ Neo4j Connection Failed: {e}")
         return
 
-    # 2. Load Data
-    print(f"📂 Scanning {DATA_PATH} for .txt files...")
-    documents = []
-    txt_files = glob.glob(os.path.join(DATA_PATH, "*.txt"))
-    
-    for file_path in txt_files:
-        try:
-            loader = TextLoader(file_path, encoding="utf-8")
-            documents.extend(loader.load())
-        except Exception:
-            pass # Skip errors for speed
-
-    # 3. Split Data
-    print("✂️ Splitting text into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
+    try:
+        ensure_entity_indexes(graph)
+    except Exception as e:
+        print(f"❌ {e}. Aborting ingestion.")
+        return
+
+    if rebuild_cache_only:
+        load_relation_cache(graph, rebuild=True)
+        return
+
+    # 2. Load Chunks (shared store; only changed files are re-chunked)
+    print(f"📂 Updating chunk store from {DATA_PATH}...")
+    build_chunk_store(DATA_PATH)
+    sources = None
+    if changed_only:
+        # Extraction is the expensive LLM step; skip files the refresh didn't touch.
+        # MERGE keeps entities idempotent, but facts removed from a page are not deleted.
+        sources = read_changed_files(DATA_PATH, ingester="graph")
+        print(f"   - Changed-only mode: {len(sources)} files not yet extracted")
+    store = open_chunk_store()
+    try:
+        prune_provenance(graph, store["chunk_id"].to_pylist())
+    except Exception as e:
+        print(f"   ⚠️ Could not prune stale provenance: {e}")
+    chunks = chunk_documents(store, sources=sources)
     
     if CHUNK_LIMIT:
         chunks = chunks[:CHUNK_LIMIT]
     
     print(f"   - Total chunks to process: {len(chunks)}")
 
+    # Incremental runs extend the snapshot; a full run starts from what the graph holds now
+    relation_cache = load_relation_cache(graph, rebuild=not changed_only)
+
     # 4. Initialize Transformer
-    llm = ChatOpenAI(temperature=0, model=MODEL_NAME)
+    llm = ChatOpenAI(temperature=0, model=MODEL_NAME, callbacks=[UsageCallback("graph_extraction")])
     llm_transformer = LLMGraphTransformer(llm=llm)
 
     # 5. Parallel Extraction
@@ -80,6 +223,7 @@ def ingest_graph():
     batches = [chunks[i:i + BATCH_SIZE] for i in range(0, len(chunks), BATCH_SIZE)]
     
     results = []
+    failed_sources = set()  # Files to retry on the next --changed-only run
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # Submit all tasks
         future_to_batch = {
@@ -90,17 +234,39 @@ def ingest_graph():
         # Collect results as they finish
         for future in as_completed(future_to_batch):
             graph_docs = future.result()
-            if graph_docs:
+            batch_sources = {c.metadata["source"] for c in batches[future_to_batch[future]]}
+            if graph_docs is None:
+                failed_sources |= batch_sources
+            elif graph_docs:
                 results.extend(graph_docs)
                 # Optional: Write to DB immediately to save progress?
                 # For safety, we can write per-batch, but let's just collect all for simplicity
                 try:
-                    graph.add_graph_documents(graph_docs)
+                    graph.add_graph_documents(graph_docs, baseEntityLabel=True)
+                    write_provenance(graph, graph_docs)
                     print("      💾 Saved batch to Neo4j")
+                    # Refresh only the chains the new edges touch
+                    if relation_cache.add_edges(chain_edges(graph_docs)):
+                        relation_cache.save(RELATION_CACHE_PATH)
                 except Exception as e:
                     print(f"      ❌ DB Write Error: {e}")
+                    failed_sources |= batch_sources
 
+    # Record what was extracted so a repeated --changed-only run doesn't pay for it again
+    # (not after a CHUNK_LIMIT trial run, which only saw part of the files)
+    if not CHUNK_LIMIT:
+        processed = sources if changed_only else read_changed_files(DATA_PATH)
+        mark_ingested("graph", [s for s in processed if s not in failed_sources], DATA_PATH)
+    if failed_sources:
+        print(f"   ⚠️ {len(failed_sources)} files had failed batches; they stay pending")
     print("✨ Graph Ingestion Complete!")
+    export_usage("ingest_graph")
 
 if __name__ == "__main__":
-    ingest_graph()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract the knowledge graph from the chunk store")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Only extract files download_data.py refreshed since they were last extracted")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="Rebuild the relation cache from the graph and exit (e.g. after remove_duplicates.py)")
+    args = parser.parse_args()
+    ingest_graph(changed_only=args.changed_only, rebuild_cache_only=args.rebuild_cache)
\ No newline at end of file
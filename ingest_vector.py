@@ -1,12 +1,13 @@
 import os
-import glob
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
+import time
+import argparse
 from langchain_community.vectorstores import Qdrant
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from dotenv import load_dotenv
+from core.chunk_store import build_chunk_store, open_chunk_store, chunk_documents, read_changed_files, mark_ingested
+from core.embeddings import get_embeddings, EMBEDDING_PROVIDER
+from core.usage import export_usage
 
 # 1. Load Environment Variables
 load_dotenv()
@@ -14,80 +15,205 @@ load_dotenv()
 # Configuration
 DATA_PATH = "./data"
 QDRANT_URL = "http://localhost:6333"
+# Live traffic queries this alias; each full rebuild goes into a new
+# "<alias>_v<timestamp>" collection and the alias is switched once it checks out.
 COLLECTION_NAME = "tech_ecosystem"
+VERSION_PREFIX = f"{COLLECTION_NAME}_v"
+KEEP_VERSIONS = 2  # Versions kept for rollback, the live one included
 
-def ingest_vectors():
-    # --- Check for API Key ---
-    if not os.getenv("OPENAI_API_KEY"):
-        print("Error: OPENAI_API_KEY not found. Did you create the .env file?")
-        return
+# A freshly built version must answer these before it goes live
+VALIDATION_QUERIES = [
+    "Who is the CEO of Tesla?",
+    "Summarize the history of Microsoft.",
+    "What is generative AI?",
+]
+VALIDATION_SAMPLE_IDS = 20  # Chunk ids that must be retrievable by key
 
-    # --- THE FIX: Manual Collection Creation ---
-    print(f"Connecting to Qdrant at {QDRANT_URL}...")
-    client = QdrantClient(url=QDRANT_URL)
-    
-    # 1. Reset: Delete if exists
-    try:
+# --- Versions & Alias ---
+
+def list_versions(client):
+    """Versioned collections, oldest first (timestamps sort lexically)."""
+    names = [c.name for c in client.get_collections().collections]
+    return sorted(n for n in names if n.startswith(VERSION_PREFIX))
+
+def live_version(client):
+    """The collection the alias points at, or None."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_NAME:
+            return alias.collection_name
+    return None
+
+def swap_alias(client, target):
+    """Points the alias at `target` in one atomic operation."""
+    operations = []
+    if live_version(client) is not None:
+        operations.append(models.DeleteAliasOperation(
+            delete_alias=models.DeleteAlias(alias_name=COLLECTION_NAME)
+        ))
+    elif COLLECTION_NAME in [c.name for c in client.get_collections().collections]:
+        # One-time migration: a real collection still holds the alias name. An alias
+        # can't shadow it, so drop it right before the switch (the only gap, milliseconds).
+        print(f"🧹 Replacing legacy collection '{COLLECTION_NAME}' with an alias")
         client.delete_collection(collection_name=COLLECTION_NAME)
-        print(f"🧹 Deleted existing collection '{COLLECTION_NAME}'")
-    except Exception:
-        pass # Ignore if it doesn't exist
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=target, alias_name=COLLECTION_NAME)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"🔀 Alias '{COLLECTION_NAME}' -> '{target}'")
 
-    # 2. Create: Define specific schema for OpenAI (1536 dimensions)
+def garbage_collect(client, keep=KEEP_VERSIONS):
+    """Drops all but the newest `keep` versions; never the live one."""
+    live = live_version(client)
+    versions = list_versions(client)
+    for name in versions[:-keep] if keep > 0 else versions:
+        if name != live:
+            client.delete_collection(collection_name=name)
+            print(f"🗑️ Deleted old version '{name}'")
+
+def rollback(client):
+    """Switches the alias back to the version built before the live one."""
+    live = live_version(client)
+    older = [v for v in list_versions(client) if live is None or v < live]
+    if not older:
+        print("❌ No older version to roll back to.")
+        return
+    swap_alias(client, older[-1])
+
+# --- Build & Validate ---
+
+def validate_version(client, name, embeddings, chunks):
+    """Checks a new version before it goes live; raises ValueError if it is not fit to serve."""
+    # Ids derive from (file, text), so chunks repeating the same text in a file share one point
+    expected = len({c.metadata["chunk_id"] for c in chunks})
+    count = client.count(collection_name=name, exact=True).count
+    if count != expected:
+        raise ValueError(f"'{name}' holds {count} points, expected {expected}")
+
+    sample_ids = list(dict.fromkeys(
+        c.metadata["chunk_id"] for c in chunks[::max(1, len(chunks) // VALIDATION_SAMPLE_IDS)]
+    ))
+    found = client.retrieve(collection_name=name, ids=sample_ids, with_payload=False)
+    if len(found) != len(sample_ids):
+        raise ValueError(f"'{name}' returned {len(found)}/{len(sample_ids)} sampled chunks by id")
+
+    for question in VALIDATION_QUERIES:
+        hits = client.query_points(
+            collection_name=name, query=embeddings.embed_query(question), limit=3
+        ).points
+        if not hits:
+            raise ValueError(f"'{name}' returned nothing for '{question}'")
+        print(f"   ✅ '{question}' -> top score {hits[0].score:.3f}")
+    print(f"   ✅ {count} points, sampled ids and queries check out")
+
+def build_version(client, embeddings, chunks):
+    """Embeds the chunks into a new versioned collection; live traffic is untouched."""
+    name = f"{VERSION_PREFIX}{time.strftime('%Y%m%d%H%M%S')}"
+    # Size the schema from the embedding provider and record which model built
+    # it, so search_vector can refuse mismatched query embeddings.
     # This bypasses the buggy LangChain initialization
-    print(f"🛠️ Creating collection '{COLLECTION_NAME}' with 1536 dimensions...")
+    print(f"🛠️ Creating collection '{name}' for '{embeddings.name}' ({embeddings.dimension} dimensions)...")
     client.create_collection(
-        collection_name=COLLECTION_NAME,
+        collection_name=name,
         vectors_config=models.VectorParams(
-            size=1536,  # Standard size for OpenAI text-embedding-ada-002
+            size=embeddings.dimension,
             distance=models.Distance.COSINE
-        )
+        ),
+        metadata=embeddings.signature()
     )
+    print(f"🚀 Ingesting into Qdrant...")
+    # Initialize the LangChain wrapper with our PRE-MADE client
+    vector_store = Qdrant(client=client, collection_name=name, embeddings=embeddings)
+    # Point ids are the chunk ids, so graph provenance can fetch the exact chunks back by key
+    vector_store.add_documents(chunks, ids=[c.metadata["chunk_id"] for c in chunks])
+    return name
+
+def replace_changed_sources(client, embeddings, changed):
+    """Incremental path: swaps the points of the refreshed source files in the live version."""
+    print(f"♻️ Updating {len(changed)} changed files in '{COLLECTION_NAME}'...")
+    build_chunk_store(DATA_PATH)
+    chunks = chunk_documents(open_chunk_store(), sources=changed)
+    new_ids = [c.metadata["chunk_id"] for c in chunks]
+
+    # Upsert first, then drop the changed files' stale chunks (old text, old ids),
+    # so a refreshed page is never missing from search in between
+    vector_store = Qdrant(client=client, collection_name=COLLECTION_NAME, embeddings=embeddings)
+    vector_store.add_documents(chunks, ids=new_ids)
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must=[models.FieldCondition(key="metadata.source", match=models.MatchAny(any=changed))],
+                must_not=[models.HasIdCondition(has_id=new_ids)],
+            )
+        ),
+    )
+    print(f"Vector Update Complete! Re-embedded {len(chunks)} chunks.")
 
-    # 2. Load Data
-    print(f"📂 Scanning {DATA_PATH} for .txt files...")
-    documents = []
-    txt_files = glob.glob(os.path.join(DATA_PATH, "*.txt"))
-    
-    if not txt_files:
-        print(f"No files found in {DATA_PATH}. Did you run download_data.py?")
+def ingest_vectors(changed_only: bool = False, keep: int = KEEP_VERSIONS):
+    # --- Check for API Key ---
+    if EMBEDDING_PROVIDER == "openai" and not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not found. Did you create the .env file?")
         return
 
-    for file_path in txt_files:
+    print(f"Connecting to Qdrant at {QDRANT_URL}...")
+    client = QdrantClient(url=QDRANT_URL)
+    embeddings = get_embeddings()
+
+    if changed_only:
+        changed = read_changed_files(DATA_PATH, ingester="vector")
+        if not changed:
+            print("✅ No changed files left to embed since the last refresh. Nothing to do.")
+            return
         try:
-            loader = TextLoader(file_path, encoding="utf-8")
-            documents.extend(loader.load())
+            replace_changed_sources(client, embeddings, changed)
+            mark_ingested("vector", changed, DATA_PATH)
         except Exception as e:
-            print(f"   - ⚠️ Error loading {os.path.basename(file_path)}: {e}")
+            print(f"Ingestion Error: {e}")
+        export_usage("ingest_vector")
+        return
 
-    print(f"✅ Successfully loaded {len(documents)} documents.")
+    # 1. Load Chunks (shared store; only changed files are re-chunked)
+    print(f"📂 Updating chunk store from {DATA_PATH}...")
+    build_chunk_store(DATA_PATH)
+    chunks = chunk_documents(open_chunk_store())
 
-    # 3. Split Data
-    print("✂️ Splitting text into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"   - Generated {len(chunks)} text chunks.")
+    if not chunks:
+        print(f"No chunks found for {DATA_PATH}. Did you run download_data.py?")
+        return
 
-    # 4. Embed & Store (Using add_documents instead of from_documents)
-    print(f"🚀 Ingesting into Qdrant...")
-    
+    print(f"   - Loaded {len(chunks)} text chunks.")
+
+    # 2. Build the new version next to the live one, then check it
+    name = None
     try:
-        # Initialize the LangChain wrapper with our PRE-MADE client
-        vector_store = Qdrant(
-            client=client,
-            collection_name=COLLECTION_NAME,
-            embeddings=OpenAIEmbeddings()
-        )
-        # Add the documents to the existing collection
-        vector_store.add_documents(chunks)
-        
-        print("Vector Ingestion Complete! You can now search this data.")
+        name = build_version(client, embeddings, chunks)
+        print(f"🔍 Validating '{name}'...")
+        validate_version(client, name, embeddings, chunks)
     except Exception as e:
         print(f"Ingestion Error: {e}")
+        if name is not None:
+            client.delete_collection(collection_name=name)
+            print(f"🧹 Discarded '{name}'; '{COLLECTION_NAME}' still serves '{live_version(client)}'")
+        return
+
+    # 3. Go live atomically, then drop versions beyond the rollback window
+    swap_alias(client, name)
+    garbage_collect(client, keep)
+    # Everything was just embedded, refreshed files included
+    mark_ingested("vector", read_changed_files(DATA_PATH), DATA_PATH)
+    print("Vector Ingestion Complete! You can now search this data.")
+    export_usage("ingest_vector")
 
 if __name__ == "__main__":
-    ingest_vectors()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed the chunk store into Qdrant")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Only re-embed files download_data.py refreshed since they were last embedded")
+    parser.add_argument("--rollback", action="store_true",
+                        help="Point the alias back at the previous version and exit")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS,
+                        help="Versions to keep for rollback after a rebuild")
+    args = parser.parse_args()
+    if args.rollback:
+        rollback(QdrantClient(url=QDRANT_URL))
+    else:
+        ingest_vectors(changed_only=args.changed_only, keep=args.keep)
@@ -36,4 +36,6 @@ try:
     graph.refresh_schema()
     print("   ✨ SUCCESS! The database schema is now valid and clean.")
 except Exception as e:
-    print(f"   ⚠️ Schema still has issues: {e}")
\ No newline at end of file
+    print(f"   ⚠️ Schema still has issues: {e}")
+
+print("   💡 Run 'python ingest_graph.py --rebuild-cache' so the relation cache matches the cleaned graph.")
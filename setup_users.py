@@ -1,51 +1,151 @@
+import os
+import csv
+import json
+import time
+import argparse
 from langchain_community.graphs import Neo4jGraph
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Connect to Graph (Blind Mode for speed)
-graph = Neo4jGraph(
-    url='bolt://localhost:7687', 
-    username='neo4j', 
-    password='password123',
-    enhanced_schema=False,
-    refresh_schema=False
-)
+# --- Configuration ---
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "password123"
+BATCH_SIZE = 5000  # Users per UNWIND transaction
+PREFERENCE_SEPARATOR = ";"  # Between preferences in a CSV cell
+
+# The two hand-written demo personas, always (re)created
+SEED_USERS = [
+    # The Technical CTO
+    {"id": "Rahul", "role": "CTO", "style": "Technical, detailed, includes code snippets",
+     "preferences": ["System Architecture", "Python Code"]},
+    # The Non-Technical CEO
+    {"id": "Ram", "role": "CEO", "style": "Executive summary, concise, focuses on business value",
+     "preferences": ["Market Risk", "ROI Analysis"]},
+]
 
-print("👤 CREATING USER PERSONAS...")
-
-# Cypher query to create users and link them to preferences
-create_users_query = """
-// 1. Create Rahul (The Technical CTO)
-MERGE (u1:User {id: 'Rahul'})
-SET u1.role = 'CTO', 
-    u1.style = 'Technical, detailed, includes code snippets'
-MERGE (t1:Preference {name: 'System Architecture'})
-MERGE (t2:Preference {name: 'Python Code'})
-MERGE (u1)-[:PREFERS]->(t1)
-MERGE (u1)-[:PREFERS]->(t2)
-
-// 2. Create Ram (The Non-Technical CEO)
-MERGE (u2:User {id: 'Ram'})
-SET u2.role = 'CEO', 
-    u2.style = 'Executive summary, concise, focuses on business value'
-MERGE (t3:Preference {name: 'Market Risk'})
-MERGE (t4:Preference {name: 'ROI Analysis'})
-MERGE (u2)-[:PREFERS]->(t3)
-MERGE (u2)-[:PREFERS]->(t4)
+# One round trip per batch. Re-running with the same file is a no-op; a changed
+# row overwrites the user's role/style and replaces their preference links.
+IMPORT_USERS_QUERY = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.id})
+SET u.role = row.role,
+    u.style = row.style
+WITH u, row
+CALL {
+    WITH u, row
+    MATCH (u)-[old:PREFERS]->(p:Preference)
+    WHERE NOT p.name IN row.preferences
+    DELETE old
+}
+FOREACH (name IN row.preferences |
+    MERGE (p:Preference {name: name})
+    MERGE (u)-[:PREFERS]->(p)
+)
 """
 
-try:
-    graph.query(create_users_query)
-    print("   ✅ Users 'Rahul' and 'Ram' created successfully!")
-except Exception as e:
-    print(f"   ❌ Error creating users: {e}")
-
-# Verify the data exists
-print("\n🔍 VERIFYING DATA:")
-try:
-    res = graph.query("MATCH (u:User)-[:PREFERS]->(p) RETURN u.id, u.role, collect(p.name) as preferences")
-    for r in res:
-        print(f"   - {r['u.id']} ({r['u.role']}): {r['preferences']}")
-except Exception as e:
-    print(f"   ⚠️ Verification failed: {e}")
\ No newline at end of file
+
+def ensure_user_constraints(graph):
+    """Unique ids give MERGE and profile lookups an index seek instead of a label scan."""
+    print("🗂️ Ensuring user constraints...")
+    graph.query("CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE")
+    graph.query("CREATE CONSTRAINT preference_name IF NOT EXISTS FOR (p:Preference) REQUIRE p.name IS UNIQUE")
+
+
+def _clean(user):
+    """Normalizes one input record; returns None if it has no id."""
+    user_id = str(user.get("id") or "").strip()
+    if not user_id:
+        return None
+    preferences = user.get("preferences") or []
+    if isinstance(preferences, str):
+        preferences = preferences.split(PREFERENCE_SEPARATOR)
+    return {
+        "id": user_id,
+        "role": user.get("role") or None,
+        "style": user.get("style") or None,
+        "preferences": list(dict.fromkeys(p.strip() for p in preferences if p and p.strip())),
+    }
+
+
+def read_users(path: str):
+    """Yields users from a CSV (id,role,style,preferences) or JSONL file, one at a time."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for line_number, record in enumerate(records, 1):
+            user = _clean(record)
+            if user is None:
+                print(f"   ⚠️ Skipping record {line_number}: missing id")
+                continue
+            yield user
+
+
+def _batches(users, batch_size):
+    batch = []
+    for user in users:
+        batch.append(user)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_users(graph, users, batch_size: int = BATCH_SIZE):
+    """Writes users and their preferences in batched UNWIND transactions; returns the user count."""
+    total = 0
+    start = time.perf_counter()
+    for batch in _batches(users, batch_size):
+        # Batches run one after another: they MERGE the same Preference nodes
+        graph.query(IMPORT_USERS_QUERY, {"rows": batch})
+        total += len(batch)
+        rate = total / max(time.perf_counter() - start, 1e-9)
+        print(f"   ✅ {total} users imported ({rate:,.0f} users/s)")
+    return total
+
+
+def setup_users(path: str = None, batch_size: int = BATCH_SIZE):
+    graph = Neo4jGraph(
+        url=NEO4J_URI,
+        username=NEO4J_USER,
+        password=NEO4J_PASSWORD,
+        enhanced_schema=False,
+        refresh_schema=False
+    )
+    ensure_user_constraints(graph)
+
+    print("👤 CREATING USER PERSONAS...")
+    try:
+        import_users(graph, [_clean(u) for u in SEED_USERS])
+        if path:
+            print(f"📥 Importing users from {os.path.basename(path)}...")
+            import_users(graph, read_users(path), batch_size)
+    except Exception as e:
+        print(f"   ❌ Error creating users: {e}")
+
+    # Verify the data exists
+    print("\n🔍 VERIFYING DATA:")
+    try:
+        count = graph.query("MATCH (u:User) RETURN count(u) AS users")[0]["users"]
+        print(f"   - {count} users in the graph")
+        res = graph.query("""
+        MATCH (u:User) WHERE u.id IN $ids
+        OPTIONAL MATCH (u)-[:PREFERS]->(p)
+        RETURN u.id, u.role, collect(p.name) as preferences
+        """, {"ids": [u["id"] for u in SEED_USERS]})
+        for r in res:
+            print(f"   - {r['u.id']} ({r['u.role']}): {r['preferences']}")
+    except Exception as e:
+        print(f"   ⚠️ Verification failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the demo personas and bulk-load users into Neo4j")
+    parser.add_argument("--file", help="CSV (id,role,style,preferences separated by ';') or JSONL of users")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Users per transaction")
+    args = parser.parse_args()
+    setup_users(args.file, args.batch_size)
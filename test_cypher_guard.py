@@ -0,0 +1,79 @@
+from core.cypher_guard import check_read_only, bound_path_lengths, enforce_limit, UnsafeCypherError
+
+# (query, should it be rejected?)
+READ_ONLY_CASES = [
+    ("MATCH (a:__Entity__ {id: 'Tesla'})-[r]-(b) RETURN a, type(r), b", False),
+    ("MATCH (p:Product {id: 'Set-top box'}) RETURN p", False),              # Keyword inside a string
+    ("MATCH (a) RETURN a // delete this later", False),                     # Keyword inside a comment
+    ("CALL db.index.fulltext.queryNodes('entity_ids', 'tesla') YIELD node RETURN node", False),
+    ("MATCH (n) RETURN n.use, n.set", False),                               # Property access, not clauses
+    ("MATCH (a) CALL { WITH a MATCH (a)-[r]-(b) RETURN b } RETURN b", False),  # Subquery, not a procedure
+    ("MATCH (a) DETACH DELETE a", True),
+    ("MATCH (a {id: 'Tesla'}) SET a.ceo = 'me' RETURN a", True),
+    ("MERGE (a:Company {id: 'X'}) RETURN a", True),
+    ("CALL apoc.cypher.runWrite('MATCH (n) DELETE n', {})", True),
+    ("RETURN apoc.text.join(['a'], ',')", True),
+    ("CALL dbms.listConfig() YIELD name RETURN name", True),
+    ("CALL db.clearQueryCaches YIELD value RETURN value", True),          # Procedure without parentheses
+    ("USE system SHOW DATABASES", True),
+]
+
+# (query, max hops, expected rewrite)
+PATH_CASES = [
+    ("MATCH (a)-[*]-(b) RETURN b", 3, "MATCH (a)-[*1..3]-(b) RETURN b"),
+    ("MATCH (a)-[r*..10]->(b) RETURN b", 3, "MATCH (a)-[r*1..3]->(b) RETURN b"),
+    ("MATCH (a)-[*2..]-(b) RETURN b", 3, "MATCH (a)-[*2..3]-(b) RETURN b"),
+    ("MATCH (a)-[*5]-(b) RETURN b", 3, "MATCH (a)-[*3]-(b) RETURN b"),
+    ("MATCH (a)-[*1..2]-(b) RETURN b", 3, "MATCH (a)-[*1..2]-(b) RETURN b"),
+    ("MATCH (a {id: '[*]'})-[r]-(b) RETURN b", 3, "MATCH (a {id: '[*]'})-[r]-(b) RETURN b"),
+    ("MATCH (a)<-[r:OWNS*]-(b) RETURN b", 3, "MATCH (a)<-[r:OWNS*1..3]-(b) RETURN b"),
+    ("RETURN [x IN range(1, 3) | x * 5] AS xs", 3, "RETURN [x IN range(1, 3) | x * 5] AS xs"),   # Arithmetic
+    ("MATCH p = (a)-[*]->(b) RETURN [n IN nodes(p) | n.id * 2]", 3,
+     "MATCH p = (a)-[*1..3]->(b) RETURN [n IN nodes(p) | n.id * 2]"),
+]
+
+# (query, limit, expected rewrite)
+LIMIT_CASES = [
+    ("MATCH (a) RETURN a", 50, "MATCH (a) RETURN a\nLIMIT 50"),
+    ("MATCH (a) RETURN a LIMIT 10;", 50, "MATCH (a) RETURN a LIMIT 10"),
+    ("MATCH (a) RETURN a LIMIT 500", 50, "MATCH (a) RETURN a LIMIT 50"),
+    ("MATCH (a) RETURN a LIMIT 10 // note", 50, "MATCH (a) RETURN a LIMIT 10"),
+    ("MATCH (a) RETURN a /* top rows */ LIMIT 500", 50, "MATCH (a) RETURN a  LIMIT 50"),
+    ("MATCH (a {id: 'LIMIT 5'}) RETURN a", 50, "MATCH (a {id: 'LIMIT 5'}) RETURN a\nLIMIT 50"),
+    ("MATCH (a) RETURN a UNION MATCH (b) RETURN b AS a", 50,
+     "CALL {\nMATCH (a) RETURN a UNION MATCH (b) RETURN b AS a\n}\nRETURN *\nLIMIT 50"),
+]
+
+
+def run_test():
+    failures = 0
+    print("🛡️ CHECKING CYPHER GUARD...\n")
+
+    for query, unsafe in READ_ONLY_CASES:
+        try:
+            check_read_only(query)
+            rejected = False
+        except UnsafeCypherError:
+            rejected = True
+        ok = rejected == unsafe
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} read-only   {'rejected' if rejected else 'allowed '}: {query}")
+
+    for query, hops, expected in PATH_CASES:
+        result = bound_path_lengths(query, hops)
+        ok = result == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} path bound  {query!r} -> {result!r}")
+
+    for query, limit, expected in LIMIT_CASES:
+        result = enforce_limit(query, limit)
+        ok = result == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} limit       {query!r} -> {result!r}")
+
+    print(f"\n{'✨ All checks passed.' if not failures else f'❌ {failures} checks failed.'}")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if run_test() else 0)
@@ -0,0 +1,60 @@
+import numpy as np
+from core.embeddings import LocalEmbeddingProvider
+
+TEXTS = [
+    "Tesla, Inc. is an American electric vehicle and clean energy company.",
+    "Nvidia designs graphics processing units for gaming and AI.",
+    "Instagram is owned by Meta Platforms.",
+    "",                                              # Empty text embeds to the zero vector
+] * 40                                               # Several batches, so the thread pool is used
+TOLERANCE = 1e-5
+
+
+def check(label, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {label}" + (f" ({detail})" if detail else ""))
+    return not ok
+
+
+def run_test():
+    failures = 0
+    print("🧮 CHECKING BUNDLED LOCAL EMBEDDING MODEL...\n")
+
+    model = LocalEmbeddingProvider(batch_size=16, num_threads=4)
+    vectors = model.embed_array(TEXTS)
+
+    failures += check("output dimension", vectors.shape == (len(TEXTS), model.dimension),
+                      f"{vectors.shape}, dimension={model.dimension}")
+    failures += check("signature", model.signature() == {"embedding_model": model.name, "embedding_dim": model.dimension})
+
+    # Deterministic: a second instance (fresh weights from the fixed seed) gives identical vectors;
+    # other batch sizes only differ by BLAS rounding
+    again = LocalEmbeddingProvider(batch_size=16, num_threads=4).embed_array(TEXTS)
+    failures += check("deterministic across instances", np.array_equal(vectors, again))
+    rebatched = LocalEmbeddingProvider(batch_size=7, num_threads=1).embed_array(TEXTS)
+    failures += check("stable across batch sizes and threads", np.allclose(vectors, rebatched, atol=TOLERANCE),
+                      f"max diff {np.abs(vectors - rebatched).max():.2e}")
+
+    norms = np.linalg.norm(vectors, axis=1)
+    non_empty = np.array([bool(t) for t in TEXTS])
+    failures += check("non-empty texts are L2-normalized",
+                      np.allclose(norms[non_empty], 1.0, atol=TOLERANCE), f"max error {np.abs(norms[non_empty] - 1).max():.2e}")
+    failures += check("empty text is the zero vector", np.allclose(norms[~non_empty], 0.0))
+
+    # embed_query (single text) must match the batched path used for documents
+    parity = max(
+        np.abs(np.array(model.embed_query(text)) - vectors[i]).max()
+        for i, text in enumerate(TEXTS[:4])
+    )
+    failures += check("embed_query matches batched embed_documents", parity < TOLERANCE, f"max diff {parity:.2e}")
+    failures += check("embed_documents returns lists", np.allclose(model.embed_documents(TEXTS[:4]), vectors[:4]))
+
+    # Sanity: a paraphrase is closer than an unrelated sentence
+    query = np.array(model.embed_query("Who owns Instagram?"))
+    failures += check("related text ranks above unrelated", query @ vectors[2] > query @ vectors[1])
+
+    print(f"\n{'✨ All checks passed.' if not failures else f'❌ {failures} checks failed.'}")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if run_test() else 0)
@@ -0,0 +1,50 @@
+from core.session import ConversationSession, is_follow_up
+
+# (question, is it a follow-up to the previous turn?)
+FOLLOW_UP_CASES = [
+    ("Who is its CEO?", True),
+    ("What does it own?", True),
+    ("And who founded it?", True),
+    ("What about their revenue?", True),
+    ("Who is the CEO of its parent company?", True),
+    ("How big is it, and who owns it?", True),
+    ("What does it cost?", True),
+    ("What does it mean to be a unicorn?", False),                # Impersonal "it"
+    ("How long does it take to build a chip fab?", False),
+    ("How much does it cost to train a large model?", False),
+    ("Is it possible to run an LLM on a phone?", False),
+    ("What is generative AI and how does it work?", False),       # Antecedent in the same question
+    ("What is AI and what is it used for?", False),
+    ("Summarize the history of cloud computing.", False),
+]
+
+
+def run_test():
+    failures = 0
+    print("🔗 CHECKING FOLLOW-UP DETECTION...\n")
+
+    for question, expected in FOLLOW_UP_CASES:
+        result = is_follow_up(question)
+        ok = result == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {'follow-up ' if result else 'standalone'}: {question}")
+
+    # Only follow-ups are rewritten, and only for retrieval
+    session = ConversationSession("Alice")
+    session.remember(["Tesla, Inc."], ["Elon Musk -[CEO_OF]- Tesla, Inc."])
+    for question, expected in [("Who is its CEO?", "Tesla, Inc."), ("What does it mean to be a unicorn?", None)]:
+        entity = session.follow_up_entity(question, [])
+        ok = entity == expected
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} resolves to {entity}: {question}")
+    resolved = session.resolve("Who is its CEO?", "Tesla, Inc.")
+    ok = resolved == "Who is Tesla, Inc.'s CEO?"
+    failures += not ok
+    print(f"{'✅' if ok else '❌'} rewritten: {resolved}")
+
+    print(f"\n{'✨ All checks passed.' if not failures else f'❌ {failures} checks failed.'}")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if run_test() else 0)